@@ -0,0 +1,246 @@
+"""
+Multi-session analysis of trial records.
+
+Walks a directory of session files (the task's values.csv / .jsonl records
+and "testing software.py"'s results.txt), parses each one with NumPy in a
+process pool and aggregates the results per participant and per
+controller: response times, score distribution, path efficiency
+(travelled / needed distance) and the learning-curve slope across the
+10-trial blocks between pause screens. The two tasks are kept apart:
+"lock" is the circle/square task, "reach" is testing software.py.
+
+Participant and controller come from each file's path relative to the
+root, by default <root>/<controller>/<participant>/<session file>:
+
+    python analytics.py sessions/ --json summary.json
+    python analytics.py sessions/ --pattern "(?P<participant>P\\d+)_(?P<controller>\\w+)"
+
+Workers hand back only per-session arrays of a few hundred floats, and
+each group folds them into streaming statistics (session_stats.RunningStat:
+Welford mean plus a fixed-size histogram for the medians and quantiles,
+about 3% relative error) and per-block sums. Memory depends on the number
+of groups, not on how many sessions or trials there are.
+"""
+import argparse
+import json
+import os
+import re
+from multiprocessing import Pool
+
+import numpy as np
+
+from session_stats import RunningStat
+
+BLOCK_SIZE = 10      # trials between wait_for_continue() pauses
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+DEFAULT_PATTERN = r"(?P<controller>[^/]+)/(?P<participant>[^/]+)/[^/]+$"
+SESSION_SUFFIXES = (".csv", ".jsonl", ".txt")
+
+
+def load_session(path):
+    """
+    Columns of one session file as a dict of NumPy arrays, or None if the
+    file isn't a trial record.
+    """
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        if not rows or "Trial" not in rows[0]:
+            return None
+        return {name: np.array([row[name] for row in rows], dtype=np.float64)
+                for name in rows[0]}
+
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+        if header[:2] != ["Trial", "Time"]:
+            return None
+        data = np.loadtxt(f, delimiter=",", ndmin=2)
+    if data.size == 0:
+        data = np.zeros((0, len(header)))
+    return {name: data[:, i] for i, name in enumerate(header)}
+
+
+def block_means(trials, values):
+    """Mean of `values` per BLOCK_SIZE-trial block, indexed from block 0."""
+    blocks = ((trials - 1) // BLOCK_SIZE).astype(np.int64)
+    sums = np.bincount(blocks, weights=values)
+    counts = np.bincount(blocks)
+    with np.errstate(invalid="ignore"):
+        return sums / counts, counts
+
+
+def learning_slope(means):
+    """Least-squares slope of block means per block (None with < 2 blocks)."""
+    valid = np.flatnonzero(np.isfinite(means))
+    if len(valid) < 2:
+        return None
+    return float(np.polyfit(valid, means[valid], 1)[0])
+
+
+def summarize_session(job):
+    """Worker: parse one file and reduce it to what the aggregates need."""
+    path, pattern, root = job
+    try:
+        columns = load_session(path)
+    except (OSError, ValueError, KeyError) as exc:
+        return {"path": path, "error": str(exc)}
+    if columns is None or len(columns["Trial"]) == 0:
+        return None
+
+    relative = os.path.relpath(path, root).replace(os.sep, "/")
+    match = re.search(pattern, relative)
+    groups = match.groupdict() if match else {}
+
+    trials = columns["Trial"]
+    times = columns["Time"]
+    summary = {
+        "path": path,
+        "participant": groups.get("participant") or "unknown",
+        "controller": groups.get("controller") or "unknown",
+        "task": "lock" if "Score" in columns else "reach",
+        "trials": trials.astype(np.int32),
+        "time": times.astype(np.float32),
+        "score": columns.get("Score", np.full(len(trials), np.nan)).astype(np.float32),
+    }
+    if "CircleNeededDist" in columns:
+        travelled = columns["CircleTraveledDist"] + columns["SquareTraveledDist"]
+        needed = columns["CircleNeededDist"] + columns["SquareNeededDist"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            summary["efficiency"] = (travelled / needed).astype(np.float32)
+    else:
+        summary["efficiency"] = np.full(len(trials), np.nan, dtype=np.float32)
+    return summary
+
+
+def iter_session_files(root):
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            if name.lower().endswith(SESSION_SUFFIXES):
+                yield os.path.join(directory, name)
+
+
+class GroupStats:
+    """Streaming trial statistics of one participant or controller, plus block curves."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.trials = 0
+        # Histogram units as in session_stats.METRICS
+        self.time = RunningStat(1e-4)
+        self.score = RunningStat(0.01)
+        self.efficiency = RunningStat(1e-3)
+        self._block_time_sum = np.zeros(0)
+        self._block_score_sum = np.zeros(0)
+        self._block_count = np.zeros(0)
+
+    def add(self, session):
+        self.sessions += 1
+        self.trials += len(session["time"])
+        # Non-finite values (reach sessions have no score) are skipped
+        for stat, name in ((self.time, "time"), (self.score, "score"),
+                           (self.efficiency, "efficiency")):
+            for value in session[name].tolist():
+                stat.add(value)
+
+        time_means, counts = block_means(session["trials"], session["time"])
+        score_means, _ = block_means(session["trials"], session["score"])
+        blocks = max(len(counts), len(self._block_count))
+        self._block_time_sum = _grow(self._block_time_sum, blocks)
+        self._block_score_sum = _grow(self._block_score_sum, blocks)
+        self._block_count = _grow(self._block_count, blocks)
+        # Each session weighs once per block it reached
+        reached = counts > 0
+        self._block_time_sum[:len(counts)][reached] += time_means[reached]
+        self._block_score_sum[:len(counts)][reached] += np.nan_to_num(score_means[reached])
+        self._block_count[:len(counts)] += reached
+
+    def result(self):
+        time, score, efficiency = self.time, self.score, self.efficiency
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block_time = self._block_time_sum / self._block_count
+            block_score = self._block_score_sum / self._block_count
+        return {
+            "sessions": self.sessions,
+            "trials": self.trials,
+            "time_mean": time.mean if time.count else None,
+            "time_median": time.quantile(0.5),
+            "score_mean": score.mean if score.count else None,
+            "score_quantiles": {str(q): score.quantile(q) for q in QUANTILES}
+            if score.count else None,
+            "path_efficiency_mean": efficiency.mean if efficiency.count else None,
+            "path_efficiency_median": efficiency.quantile(0.5),
+            "block_time": block_time.tolist(),
+            "learning_slope_time": learning_slope(block_time),
+            "learning_slope_score": learning_slope(block_score),
+        }
+
+
+def _grow(values, size):
+    if len(values) >= size:
+        return values
+    return np.concatenate([values, np.zeros(size - len(values))])
+
+
+def analyze(root, pattern=DEFAULT_PATTERN, workers=None, chunksize=16):
+    """Aggregate every session under `root`; returns the summary dict."""
+    by_participant = {}
+    by_controller = {}
+    errors = []
+    jobs = ((path, pattern, root) for path in iter_session_files(root))
+    with Pool(workers) as pool:
+        for session in pool.imap_unordered(summarize_session, jobs, chunksize):
+            if session is None:
+                continue
+            if "error" in session:
+                errors.append((session["path"], session["error"]))
+                continue
+            controller = f"{session['task']}:{session['controller']}"
+            key = (controller, session["participant"])
+            by_participant.setdefault(key, GroupStats()).add(session)
+            by_controller.setdefault(controller, GroupStats()).add(session)
+
+    return {
+        "controllers": {name: stats.result() for name, stats in sorted(by_controller.items())},
+        "participants": {f"{controller}/{participant}": stats.result()
+                         for (controller, participant), stats in sorted(by_participant.items())},
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate trial records across sessions")
+    parser.add_argument("root", help="Directory searched recursively for session files")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help="Regex with (?P<participant>) and (?P<controller>) groups, "
+                             "matched against each file's path relative to the root")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--json", help="Write the full summary to this file")
+    args = parser.parse_args()
+
+    summary = analyze(args.root, args.pattern, args.workers)
+
+    for title, groups in (("Controller", summary["controllers"]),
+                          ("Participant", summary["participants"])):
+        print(f"{title:<24} {'Sessions':>8} {'Trials':>7} {'MeanT':>7} {'MedT':>7} "
+              f"{'MeanScore':>10} {'PathEff':>8} {'Slope s/blk':>11}")
+        for name, stats in groups.items():
+            score = stats["score_mean"]
+            efficiency = stats["path_efficiency_median"]
+            slope = stats["learning_slope_time"]
+            print(f"{name:<24} {stats['sessions']:>8} {stats['trials']:>7} "
+                  f"{stats['time_mean']:>7.2f} {stats['time_median']:>7.2f} "
+                  f"{'-' if score is None else f'{score:.1f}':>10} "
+                  f"{'-' if efficiency is None else f'{efficiency:.2f}':>8} "
+                  f"{'-' if slope is None else f'{slope:.3f}':>11}")
+        print()
+    for path, error in summary["errors"]:
+        print(f"Skipped {path}: {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
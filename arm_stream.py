@@ -0,0 +1,288 @@
+"""
+UDP command stream to the rover arm.
+
+ArmStreamer sends the controller's calibrated, filtered axes to the arm as
+small datagrams at a fixed ARM_STREAM_RATE on its own thread. It is fed
+straight from the input thread (the sampler's `listener` hook), not from
+the render loop, so a command is at most one sample period plus one send
+period old whatever the frame rate. Only the newest sample is sent each
+period; older ones are coalesced (counted, never queued), and the newest
+is repeated when nothing new arrived, so the arm always has a fresh
+command. On stop() a neutral (all zero) command is sent.
+
+Datagram (little endian, PACKET.size = 38 bytes):
+
+    b"6D" | seq u32 | sample time, ns since the epoch i64 | 6 x axis f32
+
+ArmReceiver is a stand-in for the arm: it counts lost, reordered and
+duplicate datagrams and the one-way latency from the sample to its
+arrival (meaningful across machines when their clocks are NTP-synced):
+
+    python arm_stream.py receive --port 9750
+    python arm_stream.py selftest                # streamer + receiver on localhost
+"""
+import argparse
+import socket
+import struct
+import threading
+import time
+
+from calibration import AxisFilter
+from latency import LatencyHistogram
+
+MAGIC = b"6D"
+PACKET = struct.Struct("<2sIq6f")
+NUM_ARM_AXES = 6
+NEUTRAL = (0.0,) * NUM_ARM_AXES
+DEFAULT_PORT = 9750
+
+
+def parse_address(address):
+    """("host", port) from "host:port" (or just "host")."""
+    host, _, port = address.rpartition(":")
+    if not host:
+        return port, DEFAULT_PORT
+    return host, int(port)
+
+
+def arm_axis_indices(config):
+    """Controller axes sent to the arm (ARM_AXIS_INDICES, default the first six)."""
+    indices = config.ARM_AXIS_INDICES
+    if indices is None:
+        return tuple(range(NUM_ARM_AXES))
+    if isinstance(indices, str):
+        indices = [int(i) for i in indices.split(",")]
+    if len(indices) != NUM_ARM_AXES:
+        raise ValueError(f"ARM_AXIS_INDICES needs {NUM_ARM_AXES} axes, got {indices}")
+    return tuple(indices)
+
+
+class ArmStreamer:
+    """Sends the newest processed axis vector at a fixed rate over UDP."""
+
+    def __init__(self, address, axis_filter, rate_hz=500):
+        self.address = address
+        self.axis_filter = axis_filter
+        self.period = 1.0 / rate_hz
+        self.sent = 0
+        self.repeated = 0     # periods without a new sample (last command resent)
+        self.coalesced = 0    # samples replaced by a newer one before sending
+        self.error = None     # exception that stopped the thread, if any
+        # perf_counter() -> time since the epoch, for the datagram timestamps
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        # (update count, sample time, axes); neutral until the first sample
+        self._latest = (0, None, NEUTRAL)
+        self._updates = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # DSCP "expedited forwarding": ask routers to treat it as low-latency
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, 0xB8)
+        except (AttributeError, OSError):
+            pass
+        self._running = False
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config, calibrations):
+        axis_filter = AxisFilter.from_config(arm_axis_indices(config), calibrations, config)
+        return cls(parse_address(config.ARM_STREAM_ADDRESS), axis_filter,
+                   config.ARM_STREAM_RATE)
+
+    def update(self, sample_time, values):
+        """Input-thread hook: process one raw sample (all controller axes)."""
+        axes = self.axis_filter.process(sample_time, values)
+        self._updates += 1
+        # One tuple assignment, so the sender never sees a half-written sample
+        self._latest = (self._updates, sample_time, axes)
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ArmStreamer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._send(None, NEUTRAL)
+        self._socket.close()
+
+    def _send(self, sample_time, axes):
+        if sample_time is None:
+            # Not from a sample (neutral command): stamped when sent
+            sample_time = time.perf_counter()
+        packet = PACKET.pack(MAGIC, self.sent & 0xFFFFFFFF,
+                             int(sample_time * 1e9) + self._epoch_offset_ns, *axes)
+        self._socket.sendto(packet, self.address)
+        self.sent += 1
+
+    def _run(self):
+        period = self.period
+        next_time = time.perf_counter()
+        last_update = 0
+        try:
+            while self._running:
+                update, sample_time, axes = self._latest
+                if update == last_update:
+                    self.repeated += 1
+                else:
+                    self.coalesced += update - last_update - 1
+                    last_update = update
+                self._send(sample_time, axes)
+                next_time += period
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    next_time = time.perf_counter()
+        except Exception as exc:
+            self.error = exc
+            self._running = False
+
+    def report(self):
+        print(f"  {self.sent} commands sent, {self.coalesced} samples coalesced, "
+              f"{self.repeated} repeats")
+
+
+class ArmReceiver:
+    """Stand-in for the arm: receives commands and keeps link statistics."""
+
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind((host, port))
+        self._socket.settimeout(0.1)
+        self.port = self._socket.getsockname()[1]
+        self.latency = LatencyHistogram()
+        self.received = 0
+        self.lost = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.malformed = 0
+        self.axes = NEUTRAL
+        self._highest = None
+        self._seen_recent = set()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ArmReceiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._socket.close()
+
+    def receive(self, packet, arrival_ns):
+        """Account for one datagram."""
+        if len(packet) != PACKET.size or packet[:2] != MAGIC:
+            self.malformed += 1
+            return
+        _, seq, timestamp_ns, *axes = PACKET.unpack(packet)
+        self.received += 1
+        self.latency.add((arrival_ns - timestamp_ns) // 1000)
+
+        if self._highest is None:
+            self._highest = seq
+        elif seq in self._seen_recent:
+            self.duplicates += 1
+            return
+        elif seq > self._highest:
+            self.lost += seq - self._highest - 1
+            self._highest = seq
+            self.axes = tuple(axes)
+        else:
+            # Late: it was counted as lost when a newer one arrived
+            self.reordered += 1
+            self.lost -= 1
+        self._seen_recent.add(seq)
+        if len(self._seen_recent) > 4096:
+            self._seen_recent = {s for s in self._seen_recent if s > self._highest - 1024}
+
+    def _run(self):
+        while self._running:
+            try:
+                packet = self._socket.recv(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.receive(packet, time.time_ns())
+
+    def report(self):
+        print(f"  received {self.received}, lost {self.lost}, reordered {self.reordered}, "
+              f"duplicates {self.duplicates}, malformed {self.malformed}")
+        if self.latency.count:
+            print(f"  sample to arrival: p50 {self.latency.quantile(0.5) / 1000:.2f}ms  "
+                  f"p99 {self.latency.quantile(0.99) / 1000:.2f}ms  "
+                  f"max {self.latency.max / 1000:.2f}ms")
+
+
+def self_test(seconds, sample_rate, stream_rate):
+    """Synthetic 1 kHz input -> ArmStreamer -> ArmReceiver on localhost."""
+    import math
+
+    receiver = ArmReceiver(0, "127.0.0.1")
+    receiver.start()
+    streamer = ArmStreamer(("127.0.0.1", receiver.port),
+                           AxisFilter(range(NUM_ARM_AXES), {}), stream_rate)
+    streamer.start()
+    period = 1.0 / sample_rate
+    next_time = time.perf_counter()
+    end = next_time + seconds
+    while next_time < end:
+        now = time.perf_counter()
+        streamer.update(now, [math.sin(now * (1 + i)) for i in range(NUM_ARM_AXES)])
+        next_time += period
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    streamer.stop()
+    time.sleep(0.2)
+    receiver.stop()
+
+    print(f"Streamer ({stream_rate} Hz, input {sample_rate} Hz):")
+    streamer.report()
+    print("Receiver:")
+    receiver.report()
+    return receiver.received > 0 and streamer.error is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rover arm command stream tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    receive = sub.add_parser("receive", help="Stand-in arm receiver")
+    receive.add_argument("--port", type=int, default=DEFAULT_PORT)
+    receive.add_argument("--seconds", type=float, default=None,
+                         help="Stop after this long (default: until Ctrl+C)")
+    test = sub.add_parser("selftest", help="Stream synthetic input to a local receiver")
+    test.add_argument("--seconds", type=float, default=5.0)
+    test.add_argument("--input-rate", type=int, default=1000)
+    test.add_argument("--rate", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "selftest":
+        return 0 if self_test(args.seconds, args.input_rate, args.rate) else 1
+
+    receiver = ArmReceiver(args.port)
+    receiver.start()
+    print(f"Listening on UDP port {receiver.port}")
+    started = time.perf_counter()
+    try:
+        while args.seconds is None or time.perf_counter() - started < args.seconds:
+            time.sleep(1.0)
+            print(" ".join(f"{a:+.2f}" for a in receiver.axes), end="")
+            receiver.report()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+Headless batch simulator for the circle/square locking task.
+
+Runs thousands of independent trials in lockstep with NumPy, using the same
+rules as trial_engine.step() (one lane per trial): each input sample is
+integrated in fixed 1 / PHYSICS_RATE steps like FixedStepIntegrator, and
+response times are the interpolated lock times of trial_engine.lock_time().
+Axis input comes either from a recorded stream or from a synthetic
+operator, one sample per 1 / INPUT_SAMPLE_RATE seconds, so
+sensitivity/deadzone/threshold settings can be compared across a simulated
+population in seconds.
+
+    python batch_sim.py --trials 5000 --seed 1 --set TARGET_REACH_THRESHOLD=20
+"""
+import argparse
+
+import numpy as np
+
+from trial_engine import MIN_RESPONSE_TIME, TrialConfig, parse_overrides
+from trial_layout import sample_layouts
+
+
+def make_layouts(count, config, screen_width, screen_height, seed=None):
+    """`count` trial layouts as an (count, 12) array."""
+    rng = np.random.default_rng(seed)
+    return sample_layouts(config, screen_width, screen_height, count, rng).astype(np.float64)
+
+
+def entry_fraction(x0, y0, x1, y1, target_x, target_y, threshold):
+    """trial_engine.entry_fraction() for arrays of moves."""
+    fx, fy = x0 - target_x, y0 - target_y
+    c = fx * fx + fy * fy - threshold * threshold
+    dx, dy = x1 - x0, y1 - y0
+    a = dx * dx + dy * dy
+    b = 2 * (fx * dx + fy * dy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = (-b - np.sqrt(np.maximum(0.0, b * b - 4 * a * c))) / (2 * a)
+    return np.where((c <= 0) | (a == 0), 0.0, np.clip(s, 0.0, 1.0))
+
+
+def band_entry_fraction(r0, r1, low, high):
+    """trial_engine.band_entry_fraction() for arrays of values."""
+    edge = np.where(r0 < low, low, high)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.clip((edge - r0) / (r1 - r0), 0.0, 1.0)
+    return np.where((low <= r0) & (r0 <= high), 0.0, fraction)
+
+
+class BatchSimulator:
+    """Struct-of-arrays version of trial_engine.TrialState, one lane per trial."""
+
+    def __init__(self, layouts, config, screen_width, screen_height, sample_rate=None):
+        layouts = np.asarray(layouts, dtype=np.float64)
+        self.config = config
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.count = len(layouts)
+
+        (self.red_circle_radius,
+         self.target_circle_x, self.target_circle_y,
+         self.green_circle_radius, self.circle_x, self.circle_y,
+         self.red_square_side, self.target_square_x, self.target_square_y,
+         self.green_square_side, self.square_x, self.square_y) = layouts.T.copy()
+
+        self.circle_needed_distance = np.hypot(self.circle_x - self.target_circle_x,
+                                               self.circle_y - self.target_circle_y)
+        self.square_needed_distance = np.hypot(self.square_x - self.target_square_x,
+                                               self.square_y - self.target_square_y)
+        self.circle_travel_distance = np.zeros(self.count)
+        self.square_travel_distance = np.zeros(self.count)
+
+        self.circle_locked = np.zeros(self.count, dtype=bool)
+        self.square_locked = np.zeros(self.count, dtype=bool)
+        # Interpolated lock times in seconds (NaN until locked)
+        self.circle_lock_time = np.full(self.count, np.nan)
+        self.square_lock_time = np.full(self.count, np.nan)
+
+        # Input arrives at sample_rate (the task's INPUT_SAMPLE_RATE by
+        # default) and is integrated at PHYSICS_RATE, like the task's
+        # FixedStepIntegrator; every lane shares the same clock
+        if sample_rate is None:
+            sample_rate = config.INPUT_SAMPLE_RATE
+        if sample_rate <= 0 or config.PHYSICS_RATE <= 0:
+            raise ValueError("sample_rate and PHYSICS_RATE must be positive")
+        self.sample_rate = sample_rate
+        self.sample_dt = 1.0 / sample_rate
+        self.step_dt = 1.0 / config.PHYSICS_RATE
+        self.accumulator = 0.0
+        self.elapsed = 0.0
+        self.samples = 0
+
+        self._invert = np.array(config.axis_inverts(), dtype=np.float64)
+        self._deadzone = np.array(config.axis_deadzones(), dtype=np.float64)
+        min_scale = 1 - config.RELATIVE_SIZE_TOLERANCE
+        max_scale = 1 + config.RELATIVE_SIZE_TOLERANCE
+        self.min_allowed_size = self.red_circle_radius * min_scale
+        self.max_allowed_size = self.red_circle_radius * max_scale
+
+    @property
+    def done(self):
+        return self.circle_locked & self.square_locked
+
+    def step(self, axes):
+        """
+        Advance every lane by one input sample (1 / sample_rate seconds of
+        constant input, in whole physics steps).
+
+        `axes` holds raw values in trial_engine.AXIS_ORDER, either shaped
+        (count, 5) or (5,) to feed the same input to every lane.
+        """
+        axes = np.broadcast_to(np.asarray(axes, dtype=np.float64) * self._invert,
+                               (self.count, 5)).copy()
+        axes[np.abs(axes) < self._deadzone] = 0.0
+        self.samples += 1
+        self.accumulator += self.sample_dt
+        while self.accumulator >= self.step_dt:
+            self.accumulator -= self.step_dt
+            self._physics_step(axes.T, self.step_dt)
+
+    def _physics_step(self, axes, dt):
+        """One trial_engine.step() of `dt` seconds for every lane."""
+        config = self.config
+        axis_cx, axis_cy, axis_cz, axis_sx, axis_sy = axes
+        start_time = self.elapsed
+        self.elapsed += dt
+
+        # Circle updates (only lanes that are not locked)
+        moving = ~self.circle_locked
+        radius = self.green_circle_radius
+        circle_x = np.minimum(
+            np.maximum(self.circle_x + axis_cx * config.CIRCLE_POSITION_SENSITIVITY * dt, radius),
+            self.screen_width - radius)
+        circle_y = np.minimum(
+            np.maximum(self.circle_y + axis_cy * config.CIRCLE_POSITION_SENSITIVITY * dt, radius),
+            self.screen_height - radius)
+        radius = np.clip(radius + axis_cz * config.SIZE_SENSITIVITY * dt,
+                         config.CIRCLE_MIN_RADIUS, config.CIRCLE_MAX_RADIUS)
+
+        old_x, old_y, old_radius = self.circle_x, self.circle_y, self.green_circle_radius
+        step_dist = np.hypot(circle_x - old_x, circle_y - old_y)
+        self.circle_travel_distance += np.where(moving, step_dist, 0.0)
+        self.circle_x = np.where(moving, circle_x, old_x)
+        self.circle_y = np.where(moving, circle_y, old_y)
+        self.green_circle_radius = np.where(moving, radius, old_radius)
+
+        dist_circ = np.hypot(self.circle_x - self.target_circle_x,
+                             self.circle_y - self.target_circle_y)
+        locking = moving & (dist_circ <= config.TARGET_REACH_THRESHOLD) & \
+            (self.min_allowed_size <= self.green_circle_radius) & \
+            (self.green_circle_radius <= self.max_allowed_size)
+        if locking.any():
+            fraction = np.maximum(
+                entry_fraction(old_x, old_y, circle_x, circle_y,
+                               self.target_circle_x, self.target_circle_y,
+                               config.TARGET_REACH_THRESHOLD),
+                band_entry_fraction(old_radius, radius,
+                                    self.min_allowed_size, self.max_allowed_size))
+            self.circle_lock_time[locking] = start_time + fraction[locking] * dt
+            self.circle_locked |= locking
+
+        # Square updates (only lanes that are not locked)
+        moving = ~self.square_locked
+        half_gs = self.green_square_side / 2.0
+        square_x = np.minimum(
+            np.maximum(self.square_x + axis_sx * config.SQUARE_POSITION_SENSITIVITY * dt, half_gs),
+            self.screen_width - half_gs)
+        square_y = np.minimum(
+            np.maximum(self.square_y + axis_sy * config.SQUARE_POSITION_SENSITIVITY * dt, half_gs),
+            self.screen_height - half_gs)
+
+        old_x, old_y = self.square_x, self.square_y
+        step_dist = np.hypot(square_x - old_x, square_y - old_y)
+        self.square_travel_distance += np.where(moving, step_dist, 0.0)
+        self.square_x = np.where(moving, square_x, old_x)
+        self.square_y = np.where(moving, square_y, old_y)
+
+        dist_sq = np.hypot(self.square_x - self.target_square_x,
+                           self.square_y - self.target_square_y)
+        locking = moving & (dist_sq <= config.TARGET_REACH_THRESHOLD)
+        if locking.any():
+            fraction = entry_fraction(old_x, old_y, square_x, square_y,
+                                      self.target_square_x, self.target_square_y,
+                                      config.TARGET_REACH_THRESHOLD)
+            self.square_lock_time[locking] = start_time + fraction[locking] * dt
+            self.square_locked |= locking
+
+    def run(self, axis_source, max_samples):
+        """
+        Step until every lane is done or `max_samples` input samples have
+        been consumed.
+
+        `axis_source` is either a recorded stream shaped (samples, count, 5)
+        or (samples, 5), or a callable taking this simulator and returning
+        the axes for the next sample. A recorded stream that runs out
+        before `max_samples` ends the run early.
+        """
+        if callable(axis_source):
+            for _ in range(max_samples):
+                if self.done.all():
+                    break
+                self.step(axis_source(self))
+        else:
+            for axes in axis_source[:max_samples]:
+                if self.done.all():
+                    break
+                self.step(axes)
+        return self.results()
+
+    def results(self):
+        """Per-lane response time and score; NaN for lanes that never finished."""
+        done = self.done
+        # trial_engine.lock_time(): the later of the two interpolated locks
+        response_time = np.where(
+            done, np.maximum(np.maximum(self.circle_lock_time, self.square_lock_time),
+                             MIN_RESPONSE_TIME), np.nan)
+        radius_diff = np.abs(self.red_circle_radius - self.green_circle_radius)
+        needed_dist_sum = self.circle_needed_distance + self.square_needed_distance
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = (radius_diff * 3.0 + needed_dist_sum) / response_time
+        return {
+            "done": done,
+            "response_time": response_time,
+            "score": score,
+            "radius_diff": radius_diff,
+            "circle_travel_distance": self.circle_travel_distance.copy(),
+            "square_travel_distance": self.square_travel_distance.copy(),
+            "circle_needed_distance": self.circle_needed_distance,
+            "square_needed_distance": self.square_needed_distance,
+        }
+
+
+def proportional_operator(position_gain=1 / 150.0, size_gain=0.1, noise=0.05, seed=None):
+    """
+    Synthetic operator that pushes each axis towards its target in
+    proportion to the remaining error, plus Gaussian hand tremor.
+
+    Returns a callable usable as BatchSimulator.run()'s axis_source.
+    """
+    rng = np.random.default_rng(seed)
+
+    def operator(sim):
+        axes = np.empty((sim.count, 5))
+        axes[:, 0] = (sim.target_circle_x - sim.circle_x) * position_gain
+        axes[:, 1] = (sim.target_circle_y - sim.circle_y) * position_gain
+        axes[:, 2] = (sim.red_circle_radius - sim.green_circle_radius) * size_gain
+        axes[:, 3] = (sim.target_square_x - sim.square_x) * position_gain
+        axes[:, 4] = (sim.target_square_y - sim.square_y) * position_gain
+        if noise:
+            axes += rng.normal(0.0, noise, axes.shape)
+        np.clip(axes, -1.0, 1.0, out=axes)
+        # The operator thinks in on-screen directions; undo the axis
+        # inversion so step() sees what the joystick would report.
+        return axes * sim._invert
+
+    return operator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch trial simulator")
+    parser.add_argument("--trials", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--max-seconds", type=float, default=60.0,
+                        help="Give up on a trial after this much simulated time")
+    parser.add_argument("--sample-rate", type=float, default=None,
+                        help="Operator input samples per second (default INPUT_SAMPLE_RATE)")
+    parser.add_argument("--noise", type=float, default=0.05,
+                        help="Std-dev of the synthetic operator's axis noise")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a TrialConfig parameter (repeatable)")
+    args = parser.parse_args()
+
+    try:
+        config = TrialConfig(**parse_overrides(args.set))
+    except ValueError as exc:
+        parser.error(str(exc))
+    try:
+        layouts = make_layouts(args.trials, config, args.width, args.height, args.seed)
+        sim = BatchSimulator(layouts, config, args.width, args.height, args.sample_rate)
+    except ValueError as exc:
+        parser.error(str(exc))
+    results = sim.run(proportional_operator(noise=args.noise, seed=args.seed),
+                      int(args.max_seconds * sim.sample_rate))
+
+    done = results["done"]
+    print(f"Trials completed: {done.sum()}/{sim.count}")
+    if done.any():
+        times = results["response_time"][done]
+        scores = results["score"][done]
+        print(f"  Time:  mean {times.mean():.2f}s  median {np.median(times):.2f}s")
+        print(f"  Score: mean {scores.mean():.2f}  median {np.median(scores):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,418 @@
+"""
+Headless benchmarks of the harness hot paths.
+
+Runs with SDL's dummy video driver and a virtual joystick (synthetic axis
+samples), so it works on any machine and in CI:
+
+    python bench.py --json bench.json                 # full run
+    python bench.py --quick --only layout update      # a subset, fewer repeats
+    python bench.py --json new.json --compare bench.json
+
+Benchmarks:
+  update      one display frame of input handling: drain 1/60 s of 1 kHz
+              samples, calibrate/filter them and run the fixed-step physics
+  telemetry   recording those samples to a telemetry file
+  layout      randomize_new_trial() per screen size
+  hud         draw_task() into the back buffer (shapes + HUD text)
+  frame       a full frame (draw_task + present) at 1080p and 4K, dirty
+              regions vs a forced full redraw and flip, and with circle
+              sprites (sprite_cache.py), plain and antialiased
+  records     RecordSink throughput for CSV and JSONL
+
+With the dummy driver the display update itself is free, so "frame"
+measures drawing and compositing into the screen surface, not the GPU or
+monitor. Timings are per call in microseconds (mean, p50/p95/p99, max).
+For update, hud and the dirty frames the memory allocated is measured
+too (tracemalloc): the peak above the starting point, which should stay at
+a few KiB of short-lived numbers, and the net growth over all the calls.
+Net growth is not zero: the last call leaves its newest samples and HUD
+numbers alive in the reused buffers (a few KiB at most), but it is the
+same after 1,000 calls as after 10,000. tests/test_allocations.py checks
+the physics step, the integrator and the renderer per call: the peak and
+the blocks left allocated stay flat as the number of calls grows.
+--compare prints the change in p50 against an earlier --json file and
+exits with status 1 if anything got slower by more than --threshold or
+allocates more than --threshold more at peak.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pygame
+
+from calibration import AxisFilter
+from dirty_render import DirtyRenderer
+from input_sampler import AxisRingBuffer
+from record_sink import RecordSink
+from sprite_cache import ShapeCache
+from task_view import draw_task, prefetch_shapes, warm_trial
+from telemetry import TrialTelemetry
+from text_cache import TextCache
+from trial_engine import (TrialConfig, TrialState, RECORD_HEADER, FixedStepIntegrator,
+                          trial_record)
+from trial_layout import randomize_new_trial
+
+LAYOUT_SIZES = ((800, 600), (1280, 720), (1920, 1080), (3840, 2160))
+FRAME_SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+NUM_AXES = 12                       # what the HID controller reports
+SAMPLE_RATE = 1000
+FRAME_RATE = 60
+
+
+def stats(durations_ns):
+    """Summary of per-call durations in microseconds."""
+    us = np.asarray(durations_ns, dtype=np.float64) / 1000
+    p50, p95, p99 = np.percentile(us, (50, 95, 99))
+    return {
+        "count": int(len(us)),
+        "mean_us": float(us.mean()),
+        "p50_us": float(p50),
+        "p95_us": float(p95),
+        "p99_us": float(p99),
+        "max_us": float(us.max()),
+    }
+
+
+def time_calls(fn, repeat, warmup=10):
+    """Per-call durations (ns) of `fn()` after `warmup` untimed calls."""
+    for _ in range(warmup):
+        fn()
+    clock = time.perf_counter_ns
+    durations = []
+    for _ in range(repeat):
+        start = clock()
+        fn()
+        durations.append(clock() - start)
+    return durations
+
+
+def allocations(fn, repeat, warmup=10):
+    """
+    Bytes traced by tracemalloc over `repeat` calls: the peak, and the net
+    growth (what is still allocated after the last call).
+    """
+    for _ in range(warmup):
+        fn()
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(repeat):
+            fn()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"alloc_peak_bytes": peak - start, "alloc_net_bytes": current - start}
+
+
+class VirtualJoystick:
+    """Smooth synthetic axis values, roughly what an operator produces."""
+
+    def __init__(self, num_axes=NUM_AXES, seed=1):
+        rng = random.Random(seed)
+        self.num_axes = num_axes
+        self.phases = [rng.uniform(0, 2 * math.pi) for _ in range(num_axes)]
+        self.speeds = [rng.uniform(0.3, 2.0) for _ in range(num_axes)]
+
+    def values(self, t):
+        return [0.8 * math.sin(t * s + p) for s, p in zip(self.speeds, self.phases)]
+
+
+def new_trial(config, width, height, rng):
+    return TrialState(randomize_new_trial(config, width, height, rng))
+
+
+# ------------------------------------------------------------------------------
+# Benchmarks
+# ------------------------------------------------------------------------------
+def bench_update(repeat):
+    config = TrialConfig()
+    width, height = 1920, 1080
+    rng = random.Random(1)
+    joystick = VirtualJoystick()
+    ring = AxisRingBuffer(NUM_AXES)
+    axis_filter = AxisFilter.from_config(config.axis_indices(), {}, config)
+    integrator = FixedStepIntegrator(config, width, height)
+    per_frame = SAMPLE_RATE // FRAME_RATE
+    state = {"trial": new_trial(config, width, height, rng), "t": 0.0,
+             "cursor": 0, "last": 0.0}
+    integrator.reset(state["trial"])
+
+    def frame():
+        trial = state["trial"]
+        cursor, samples, _ = ring.read(state["cursor"])
+        state["cursor"] = cursor
+        last = state["last"]
+        for sample_time, values in samples:
+            dt = sample_time - last
+            last = sample_time
+            if integrator.advance(trial, axis_filter.process(sample_time, values), dt):
+                trial.reset(randomize_new_trial(config, width, height, rng))
+                integrator.reset(trial)
+                break
+        state["last"] = last
+
+    def sample():
+        for _ in range(per_frame):
+            state["t"] += 1 / SAMPLE_RATE
+            ring.push(state["t"], joystick.values(state["t"]))
+
+    def sampled_frame():
+        sample()
+        frame()
+
+    # The sampler thread's pushes happen outside the timed frame (they are
+    # in the allocation figures: a short-lived list per sample)
+    durations = []
+    clock = time.perf_counter_ns
+    for i in range(repeat + 10):
+        sample()
+        start = clock()
+        frame()
+        if i >= 10:
+            durations.append(clock() - start)
+    return {"update": dict(stats(durations), **allocations(sampled_frame, min(repeat, 500)))}
+
+
+def bench_telemetry(repeat, directory):
+    config = TrialConfig()
+    trial = new_trial(config, 1920, 1080, random.Random(2))
+    joystick = VirtualJoystick()
+    telemetry = TrialTelemetry(os.path.join(directory, "bench.tlm"), NUM_AXES)
+    per_frame = SAMPLE_RATE // FRAME_RATE
+    samples = [(i / SAMPLE_RATE, joystick.values(i / SAMPLE_RATE)) for i in range(per_frame)]
+
+    def frame():
+        for sample_time, values in samples:
+            telemetry.record(sample_time, 1, 0.0, trial, values)
+
+    try:
+        return {"telemetry": stats(time_calls(frame, repeat))}
+    finally:
+        telemetry.close()
+
+
+def bench_layout(repeat):
+    config = TrialConfig()
+    results = {}
+    for width, height in LAYOUT_SIZES:
+        rng = random.Random(3)
+        results[f"layout[{width}x{height}]"] = stats(time_calls(
+            lambda: randomize_new_trial(config, width, height, rng), repeat, warmup=3))
+    return results
+
+
+def _frame_setup(width, height, sprites=False, antialias=False):
+    screen = pygame.display.set_mode((width, height))
+    config = TrialConfig()
+    shapes = None
+    if sprites:
+        shapes = ShapeCache(screen, antialias)
+        prefetch_shapes(shapes, config)
+        shapes.warm(float("inf"))
+    renderer = DirtyRenderer(screen, shapes=shapes)
+    text = TextCache(pygame.font.SysFont(None, 36))
+    trial = new_trial(config, width, height, random.Random(4))
+    if shapes is not None:
+        warm_trial(shapes, trial)
+    return screen, renderer, text, trial
+
+
+def _move(trial, i):
+    # Something changes every frame, as during a trial
+    trial.circle_x += math.sin(i * 0.05) * 4
+    trial.square_y += math.cos(i * 0.05) * 4
+    trial.circle_travel_distance += 4.0
+
+
+def bench_hud(repeat):
+    screen, renderer, text, trial = _frame_setup(1920, 1080)
+    counter = [0]
+
+    def frame():
+        counter[0] += 1
+        _move(trial, counter[0])
+        draw_task(renderer, text, trial, counter[0])
+        renderer.render()
+
+    return {"hud[1080p]": dict(stats(time_calls(frame, repeat)),
+                               **allocations(frame, min(repeat, 500)))}
+
+
+def bench_frame(repeat):
+    results = {}
+    variants = (("", False, False), (",sprites", True, False), (",sprites-aa", True, True))
+    for (label, (width, height)), (suffix, sprites, antialias) in \
+            ((size, variant) for size in FRAME_SIZES.items() for variant in variants):
+        screen, renderer, text, trial = _frame_setup(width, height, sprites, antialias)
+        counter = [0]
+
+        def dirty():
+            counter[0] += 1
+            _move(trial, counter[0])
+            draw_task(renderer, text, trial, counter[0])
+            renderer.present()
+
+        def full():
+            counter[0] += 1
+            _move(trial, counter[0])
+            renderer.invalidate()
+            draw_task(renderer, text, trial, counter[0])
+            renderer.present()
+
+        results[f"frame[{label},dirty{suffix}]"] = dict(stats(time_calls(dirty, repeat)),
+                                                        **allocations(dirty, repeat))
+        results[f"frame[{label},full{suffix}]"] = stats(time_calls(full, repeat))
+    return results
+
+
+def bench_records(rows, directory):
+    config = TrialConfig()
+    trial = new_trial(config, 1920, 1080, random.Random(5))
+    row = trial_record(1, trial, 1.2345, config, 1.25)
+    results = {}
+    for fmt in ("csv", "jsonl"):
+        sink = RecordSink(os.path.join(directory, f"bench.{fmt}"), RECORD_HEADER, fmt=fmt)
+        clock = time.perf_counter_ns
+        durations = []
+        start = clock()
+        for i in range(rows):
+            t = clock()
+            sink.write(row)
+            durations.append(clock() - t)
+        sink.close()
+        elapsed = (clock() - start) / 1e9
+        results[f"records[{fmt}]"] = dict(stats(durations), rows_per_s=rows / elapsed)
+    return results
+
+
+BENCHMARKS = ("update", "telemetry", "layout", "hud", "frame", "records")
+
+
+def run(only=None, quick=False):
+    """Run the benchmarks (all, or the names in `only`); returns the results dict."""
+    scale = 0.1 if quick else 1.0
+
+    def n(count):
+        return max(10, int(count * scale))
+
+    pygame.display.init()
+    pygame.font.init()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name in BENCHMARKS:
+            if only and name not in only:
+                continue
+            started = time.perf_counter()
+            if name == "update":
+                results.update(bench_update(n(5000)))
+            elif name == "telemetry":
+                results.update(bench_telemetry(n(5000), directory))
+            elif name == "layout":
+                results.update(bench_layout(n(300)))
+            elif name == "hud":
+                results.update(bench_hud(n(2000)))
+            elif name == "frame":
+                results.update(bench_frame(n(300)))
+            elif name == "records":
+                results.update(bench_records(n(50000), directory))
+            print(f"  {name} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    pygame.quit()
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+def print_results(results):
+    print(f"{'Benchmark':<30} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'max us':>10}")
+    for name, r in results.items():
+        line = (f"{name:<30} {r['p50_us']:>10.1f} {r['p95_us']:>10.1f} "
+                f"{r['p99_us']:>10.1f} {r['max_us']:>10.1f}")
+        if "rows_per_s" in r:
+            line += f"  ({r['rows_per_s']:,.0f} rows/s)"
+        if "alloc_peak_bytes" in r:
+            line += (f"  (alloc peak {r['alloc_peak_bytes'] / 1024:.1f} KiB, "
+                     f"net {r['alloc_net_bytes']:+.0f} B)")
+        print(line)
+
+
+def compare(results, baseline, threshold):
+    """Print p50 changes against `baseline`; returns the names that regressed."""
+    regressions = []
+    print(f"\n{'Benchmark':<30} {'before':>10} {'after':>10} {'change':>8}")
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["p50_us"], r["p50_us"]
+        change = after / before - 1 if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        print(f"{name:<30} {before:>10.1f} {after:>10.1f} {change:>+7.0%}{flag}")
+        if "alloc_peak_bytes" in r and "alloc_peak_bytes" in baseline[name]:
+            before, after = baseline[name]["alloc_peak_bytes"], r["alloc_peak_bytes"]
+            change = after / before - 1 if before else 0.0
+            if change > threshold:
+                print(f"{'':<30} alloc peak {before:.0f} -> {after:.0f} B  MORE MEMORY")
+                regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the harness hot paths (headless)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run")
+    parser.add_argument("--quick", action="store_true", help="A tenth of the repeats")
+    parser.add_argument("--json", help="Write the results (with machine details) here")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Earlier --json output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown of p50 counted as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run(args.only, args.quick)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"metadata": metadata(), "results": results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,348 @@
+"""
+Per-axis controller calibration and low-latency filtering.
+
+Every potentiometer has its own travel and rest position, and some of them
+jitter. Calibration measures, per axis, the rest position and its noise
+floor (controller left alone) and the minimum/maximum reached (every
+control swept through its full range), and stores them per device in a
+JSON file:
+
+    python calibration.py                       # writes CALIBRATION_PATH
+    python calibration.py --path cal.json --windowed
+    python calibration.py --serial COM5         # serial_input.py channels
+
+AxisFilter then turns raw axis values into calibrated ones for the task:
+
+  1. normalize: center -> 0, the measured min/max -> -1/+1 (each side
+     scaled on its own, so an off-center rest position isn't a bias);
+  2. One Euro filter: a low-pass whose cutoff rises with the axis speed,
+     so a still axis is smoothed heavily while a moving one barely lags;
+  3. deadband: NOISE_DEADBAND noise standard deviations around the center
+     are zero, so jitter at rest can't creep the circle into a lock.
+
+Each step is a handful of float operations per axis and sample, whatever
+the sample rate. An axis without calibration data keeps the raw -1..1
+range and no deadband (the TrialConfig deadzones still apply in step()).
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+from output_files import write_json
+
+DEFAULT_RANGE = (-1.0, 0.0, 1.0)
+MIN_SPAN = 0.1       # a side swept less than this keeps the default range
+MAX_DEADBAND = 0.5   # cap for a noisy (or badly calibrated) axis
+
+
+def device_key(joystick):
+    """Name the calibration file uses for a controller."""
+    name = joystick.get_name()
+    get_guid = getattr(joystick, "get_guid", None)
+    return f"{name} [{get_guid()}]" if get_guid else name
+
+
+class AxisCalibration:
+    """Measured range, rest position and noise floor of one axis."""
+
+    def __init__(self, minimum=-1.0, center=0.0, maximum=1.0, noise=0.0):
+        self.minimum = minimum
+        self.center = center
+        self.maximum = maximum
+        self.noise = noise
+
+    @classmethod
+    def fit(cls, rest_values, low, high):
+        """Calibration from samples taken at rest plus the swept extremes."""
+        n = len(rest_values)
+        center = sum(rest_values) / n
+        noise = math.sqrt(sum((v - center) ** 2 for v in rest_values) / n)
+        low = min(low, min(rest_values))
+        high = max(high, max(rest_values))
+        # An axis that wasn't moved (or barely) keeps the nominal range
+        if center - low < MIN_SPAN:
+            low = DEFAULT_RANGE[0]
+        if high - center < MIN_SPAN:
+            high = DEFAULT_RANGE[2]
+        return cls(low, center, high, noise)
+
+    def normalize(self, raw):
+        """`raw` scaled to -1..1 around the rest position."""
+        offset = raw - self.center
+        if offset >= 0:
+            return min(offset / (self.maximum - self.center), 1.0)
+        return max(offset / (self.center - self.minimum), -1.0)
+
+    def noise_fraction(self):
+        """The noise floor in normalized units (relative to the shorter side)."""
+        return self.noise / min(self.maximum - self.center, self.center - self.minimum)
+
+    def as_dict(self):
+        return {"min": self.minimum, "center": self.center,
+                "max": self.maximum, "noise": self.noise}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values["min"], values["center"], values["max"], values["noise"])
+
+
+def load_calibrations(path, key):
+    """{axis index: AxisCalibration} stored for device `key` ({} if none)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        devices = json.load(f)
+    return {int(index): AxisCalibration.from_dict(values)
+            for index, values in devices.get(key, {}).items()}
+
+
+def save_calibrations(path, key, calibrations):
+    """Store the calibrations of device `key`, keeping other devices'."""
+    devices = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            devices = json.load(f)
+    devices[key] = {str(index): c.as_dict() for index, c in sorted(calibrations.items())}
+    write_json(path, devices)
+
+
+def calibrations_as_dict(calibrations):
+    """JSON-friendly form, e.g. for a telemetry header."""
+    return {str(index): c.as_dict() for index, c in calibrations.items()}
+
+
+def calibrations_from_dict(values):
+    return {int(index): AxisCalibration.from_dict(c) for index, c in values.items()}
+
+
+class OneEuroFilter:
+    """
+    The 1€ filter (Casiez, Roussel & Vogel, CHI 2012) for one signal:
+    an exponential low-pass whose cutoff is min_cutoff + beta * |speed|.
+    """
+
+    def __init__(self, min_cutoff, beta, d_cutoff):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.speed = 0.0
+        self.timestamp = None
+
+    def reset(self):
+        self.value = None
+
+    def __call__(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+            self.speed = 0.0
+            self.timestamp = timestamp
+            return value
+        dt = timestamp - self.timestamp
+        if dt <= 0:
+            return self.value
+        self.timestamp = timestamp
+
+        # alpha = 1 / (1 + tau / dt) with tau = 1 / (2 pi cutoff)
+        speed = (value - self.value) / dt
+        alpha = 1.0 / (1.0 + 1.0 / (2 * math.pi * self.d_cutoff * dt))
+        self.speed += alpha * (speed - self.speed)
+
+        cutoff = self.min_cutoff + self.beta * abs(self.speed)
+        alpha = 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+        self.value += alpha * (value - self.value)
+        return self.value
+
+
+class AxisFilter:
+    """
+    Calibrated, filtered values of the controller axes `indices`.
+
+    process() takes the full raw axis list of a sample and returns the
+    values of `indices` in that order (e.g. trial_engine.AXIS_ORDER).
+    """
+
+    def __init__(self, indices, calibrations, min_cutoff=0.0, beta=0.0, d_cutoff=1.0,
+                 deadband=0.0):
+        self.indices = tuple(indices)
+        self.calibrations = [calibrations.get(i) or AxisCalibration() for i in self.indices]
+        self.deadbands = [min(deadband * c.noise_fraction(), MAX_DEADBAND)
+                          for c in self.calibrations]
+        # min_cutoff 0 turns the filter off
+        self.filters = [OneEuroFilter(min_cutoff, beta, d_cutoff) if min_cutoff > 0 else None
+                        for _ in self.indices]
+
+    @classmethod
+    def from_config(cls, indices, calibrations, config):
+        return cls(indices, calibrations, config.FILTER_MIN_CUTOFF, config.FILTER_BETA,
+                   config.FILTER_D_CUTOFF, config.NOISE_DEADBAND)
+
+    def reset(self):
+        for f in self.filters:
+            if f is not None:
+                f.reset()
+
+    def process(self, timestamp, values):
+        out = []
+        for index, calibration, one_euro, band in zip(self.indices, self.calibrations,
+                                                      self.filters, self.deadbands):
+            value = calibration.normalize(values[index])
+            if one_euro is not None:
+                value = one_euro(value, timestamp)
+            if band:
+                # Rescaled past the deadband so the output stays continuous
+                if abs(value) <= band:
+                    value = 0.0
+                elif value > 0:
+                    value = (value - band) / (1.0 - band)
+                else:
+                    value = (value + band) / (1.0 - band)
+            out.append(value)
+        return tuple(out)
+
+
+def load_axis_filter(indices, config, joystick):
+    """
+    AxisFilter for `joystick` from CALIBRATION_PATH and the filter settings
+    in `config`; returns (axis_filter, calibrations).
+    """
+    key = device_key(joystick)
+    calibrations = load_calibrations(config.CALIBRATION_PATH, key)
+    if config.CALIBRATION_PATH and not calibrations:
+        print(f"No calibration for {key}; run calibration.py to create one.")
+    return AxisFilter.from_config(indices, calibrations, config), calibrations
+
+
+# ------------------------------------------------------------------------------
+# Interactive calibration
+# ------------------------------------------------------------------------------
+def run_calibration(screen, text, joystick, rest_seconds=3.0):
+    """
+    Measure every axis of `joystick`: first at rest for `rest_seconds`,
+    then while the operator sweeps each control end to end until ENTER.
+    Returns {axis index: AxisCalibration}, or None if ESC was pressed.
+    """
+    import pygame
+
+    num_axes = joystick.get_numaxes()
+    width, height = screen.get_size()
+    clock = pygame.time.Clock()
+
+    def show(lines, bars=None):
+        screen.fill((0, 0, 0))
+        for i, line in enumerate(lines):
+            surface = text.render(line)
+            screen.blit(surface, surface.get_rect(center=(width // 2, 80 + i * 40)))
+        for i, (value, low, high) in enumerate(bars or ()):
+            y = 220 + i * 36
+            text.draw_line(screen, (40, y), (f"Axis {i}: ", (value, "+.3f")))
+            left, span = 240, width - 300
+            pygame.draw.rect(screen, (60, 60, 60), (left, y, span, 20), 1)
+            pygame.draw.rect(screen, (0, 120, 0),
+                             (left + (low + 1) / 2 * span, y, (high - low) / 2 * span, 20))
+            pygame.draw.line(screen, (0, 255, 0), (left + (value + 1) / 2 * span, y),
+                             (left + (value + 1) / 2 * span, y + 20), 3)
+        pygame.display.flip()
+
+    def wait_key(lines):
+        while True:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT or \
+                   (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    return False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                    return True
+            show(lines)
+            clock.tick(30)
+
+    def read():
+        return [joystick.get_axis(i) for i in range(num_axes)]
+
+    if not wait_key(["Calibration: let go of every control.",
+                     "Press ENTER, then don't touch the controller."]):
+        return None
+
+    rest = [[] for _ in range(num_axes)]
+    end = time.perf_counter() + rest_seconds
+    while time.perf_counter() < end:
+        pygame.event.pump()
+        for samples, value in zip(rest, read()):
+            samples.append(value)
+        show([f"Measuring rest position... {end - time.perf_counter():.1f}s"])
+        time.sleep(0.002)
+
+    low = [min(samples) for samples in rest]
+    high = [max(samples) for samples in rest]
+    sweeping = True
+    while sweeping:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or \
+               (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return None
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                sweeping = False
+        values = read()
+        for i, value in enumerate(values):
+            low[i] = min(low[i], value)
+            high[i] = max(high[i], value)
+        show(["Move every control to both ends of its travel.",
+              "Press ENTER when done, ESC to cancel."],
+             list(zip(values, low, high)))
+        clock.tick(250)
+
+    return {i: AxisCalibration.fit(rest[i], low[i], high[i]) for i in range(num_axes)}
+
+
+def main():
+    from trial_engine import TrialConfig
+
+    parser = argparse.ArgumentParser(description="Calibrate the controller axes")
+    parser.add_argument("--path", default=TrialConfig.CALIBRATION_PATH,
+                        help="Calibration file (default: TrialConfig.CALIBRATION_PATH)")
+    parser.add_argument("--windowed", action="store_true")
+    parser.add_argument("--serial", metavar="PORT",
+                        help="Calibrate the serial stream (serial_input.py) instead of the joystick")
+    parser.add_argument("--baud", type=int, default=TrialConfig.SERIAL_BAUD)
+    args = parser.parse_args()
+
+    import pygame
+    from startup import init_pygame, open_screen
+    from text_cache import TextCache
+
+    init_pygame()
+    screen = open_screen(not args.windowed)
+    pygame.display.set_caption("Controller Calibration")
+    text = TextCache(lambda: pygame.font.SysFont(None, 36))
+    if args.serial:
+        from serial_input import SerialAxisSource
+        joystick = SerialAxisSource(args.serial, args.baud)
+        joystick.start()
+    elif pygame.joystick.get_count() == 0:
+        print("No joystick detected. Connect a joystick and try again.")
+        pygame.quit()
+        return 1
+    else:
+        joystick = pygame.joystick.Joystick(0)
+        joystick.init()
+
+    calibrations = run_calibration(screen, text, joystick)
+    if args.serial:
+        joystick.stop()
+    pygame.quit()
+    if calibrations is None:
+        print("Calibration cancelled; nothing saved.")
+        return 1
+
+    key = device_key(joystick)
+    save_calibrations(args.path, key, calibrations)
+    print(f"Saved calibration for {key} to {args.path}:")
+    for index, c in sorted(calibrations.items()):
+        print(f"  axis {index}: min {c.minimum:+.3f}  center {c.center:+.3f}  "
+              f"max {c.maximum:+.3f}  noise {c.noise:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
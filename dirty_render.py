@@ -0,0 +1,221 @@
+"""
+Dirty-rectangle renderer for the circle/square task.
+
+Instead of filling and flipping the whole fullscreen surface every frame,
+the frame is described as a list of items (circles, rects, HUD lines).
+Items that are identical to last frame are left alone; only the regions
+of items that moved, changed or disappeared are cleared, redrawn and
+pushed with pygame.display.update(rects). When the dirty area gets large
+(or after a screen like the pause message drew over everything) it falls
+back to a plain fill + flip.
+
+The frame description is pooled: each draw call rewrites a preallocated
+item (and its Rect) in place and render() compares the frame with the
+previous one item by item, so a steady frame allocates no new objects
+for it (only the numbers it was given, which the pool holds until the
+item is rewritten).
+"""
+import pygame
+
+CIRCLE, RECT, TEXT = 0, 1, 2
+
+
+class _Item:
+    """One queued draw call; rewritten in place every frame."""
+
+    __slots__ = ("kind", "color", "x", "y", "w", "h", "pos", "text_cache", "parts", "rect")
+
+    def __init__(self):
+        self.kind = None
+        self.color = None
+        self.x = self.y = self.w = self.h = 0   # circle: center and radius
+        self.pos = None
+        self.text_cache = None
+        self.parts = []
+        self.rect = pygame.Rect(0, 0, 0, 0)     # area the item covers
+
+    def same_as(self, other):
+        if self.kind != other.kind:
+            return False
+        if self.kind == TEXT:
+            return (self.pos == other.pos and self.text_cache is other.text_cache
+                    and self.parts == other.parts)
+        return (self.color == other.color and self.x == other.x and self.y == other.y
+                and self.w == other.w and self.h == other.h)
+
+
+class DirtyRenderer:
+    """Collects one frame of draw calls and presents only what changed."""
+
+    def __init__(self, screen, background=(0, 0, 0), full_flip_ratio=0.4, shapes=None,
+                 scale=1.0):
+        self.screen = screen
+        # Logical units -> screen pixels (startup.open_scaled_screen); draw
+        # calls take logical coordinates
+        self.scale = scale
+        # Optional sprite_cache.ShapeCache: circles become blits
+        self.shapes = shapes
+        self.background = background
+        # Flip the whole screen when the dirty area exceeds this fraction
+        self.full_flip_ratio = full_flip_ratio
+        self._screen_width, self._screen_height = screen.get_size()
+        self._screen_area = self._screen_width * self._screen_height
+
+        # Two item pools, swapped by render(): the frame being built and
+        # what is currently on screen
+        self._items = []
+        self._count = 0
+        self._previous = []
+        self._previous_count = 0
+        self._full_redraw = True
+        self._flip = False          # update() flips instead of pushing regions
+        self._dirty = []            # regions for update(), from the pool below
+        self._regions = []
+        self._blit_pos = pygame.Rect(0, 0, 0, 0)
+
+        # Counters, handy when checking how often the fallback kicks in
+        self.partial_frames = 0
+        self.full_frames = 0
+
+    def invalidate(self):
+        """Force the next present() to redraw and flip the whole screen."""
+        self._full_redraw = True
+
+    def _next_item(self, kind):
+        count = self._count
+        if count == len(self._items):
+            self._items.append(_Item())
+        item = self._items[count]
+        self._count = count + 1
+        item.kind = kind
+        return item
+
+    def circle(self, color, center, radius):
+        cx, cy = center
+        scale = self.scale
+        if scale != 1.0:
+            cx, cy, radius = int(cx * scale), int(cy * scale), int(radius * scale)
+        item = self._next_item(CIRCLE)
+        item.color = color
+        item.x, item.y, item.w, item.h = cx, cy, radius, 0
+        # +1 px margin: pygame's circle rasterizer can spill one pixel
+        item.rect.update(cx - radius - 1, cy - radius - 1, 2 * radius + 2, 2 * radius + 2)
+
+    def rect(self, color, rect):
+        item = self._next_item(RECT)
+        item.color = color
+        bounds = item.rect
+        bounds.update(rect)
+        scale = self.scale
+        if scale != 1.0:
+            bounds.update(int(bounds.x * scale), int(bounds.y * scale),
+                          int(bounds.w * scale), int(bounds.h * scale))
+        item.x, item.y, item.w, item.h = bounds.x, bounds.y, bounds.w, bounds.h
+
+    def text_line(self, text_cache, pos, parts):
+        """A TextCache.draw_line() call, deferred until present()."""
+        if self.scale != 1.0:
+            # The text itself is sized by the TextCache's font
+            pos = (int(pos[0] * self.scale), int(pos[1] * self.scale))
+        item = self._next_item(TEXT)
+        item.pos = pos
+        item.text_cache = text_cache
+        item.parts[:] = parts
+        text_cache.measure_line(pos, item.parts, item.rect)
+
+    def present(self):
+        """Draw the collected items and update the display."""
+        self.render()
+        self.update()
+
+    def _add_dirty(self, rect):
+        """Queue `rect`, clipped to the screen; returns its area."""
+        left = max(rect.x, 0)
+        top = max(rect.y, 0)
+        right = min(rect.x + rect.w, self._screen_width)
+        bottom = min(rect.y + rect.h, self._screen_height)
+        if right <= left or bottom <= top:
+            return 0
+        dirty = self._dirty
+        if len(dirty) == len(self._regions):
+            self._regions.append(pygame.Rect(0, 0, 0, 0))
+        region = self._regions[len(dirty)]
+        region.update(left, top, right - left, bottom - top)
+        dirty.append(region)
+        return region.w * region.h
+
+    def render(self):
+        """
+        Draw the collected items into the screen surface only; update()
+        then pushes them to the display (split so the two can be timed).
+        """
+        items, count = self._items, self._count
+        previous, previous_count = self._previous, self._previous_count
+        dirty = self._dirty
+        dirty.clear()
+
+        if not self._full_redraw:
+            area = 0
+            for i in range(max(count, previous_count)):
+                if i < count and i < previous_count and items[i].same_as(previous[i]):
+                    continue
+                if i < previous_count:
+                    area += self._add_dirty(previous[i].rect)
+                if i < count:
+                    area += self._add_dirty(items[i].rect)
+            if area > self.full_flip_ratio * self._screen_area:
+                self._full_redraw = True
+
+        if self._full_redraw:
+            self.screen.fill(self.background)
+            for i in range(count):
+                self._draw(items[i])
+            dirty.clear()
+            self._flip = True
+            self._full_redraw = False
+            self.full_frames += 1
+        elif dirty:
+            screen = self.screen
+            for region in dirty:
+                # Clip so redrawing an item never paints over a later
+                # (higher) item outside the region being repaired.
+                screen.set_clip(region)
+                screen.fill(self.background, region)
+                for i in range(count):
+                    item = items[i]
+                    if item.rect.colliderect(region):
+                        self._draw(item)
+            screen.set_clip(None)
+            self.partial_frames += 1
+
+        self._items, self._previous = previous, items
+        self._previous_count = count
+        self._count = 0
+
+    def update(self):
+        """Push what render() drew: the dirty regions, or a full flip."""
+        if self._flip:
+            pygame.display.flip()
+            self._flip = False
+        elif self._dirty:
+            pygame.display.update(self._dirty)
+        self._dirty.clear()
+
+    def _draw(self, item):
+        kind = item.kind
+        if kind == CIRCLE:
+            radius = item.w
+            if self.shapes is not None:
+                if radius >= 1:
+                    # Same pixels as pygame.draw.circle (sprite_cache.py)
+                    pos = self._blit_pos
+                    pos.x = item.x - radius
+                    pos.y = item.y - radius
+                    self.screen.blit(self.shapes.circle(item.color, radius), pos)
+            else:
+                pygame.draw.circle(self.screen, item.color, (item.x, item.y), radius)
+        elif kind == RECT:
+            # Same pixels as a filled pygame.draw.rect, on SDL's fill path
+            self.screen.fill(item.color, item.rect)
+        else:
+            item.text_cache.draw_line(self.screen, item.pos, item.parts)
@@ -0,0 +1,93 @@
+"""
+Event-driven controller input.
+
+Instead of polling every axis each frame, AxisEventState keeps the current
+axis values up to date from the JOYAXISMOTION events pygame already queues,
+timestamping each change with time.perf_counter() as it is dequeued.
+drain() returns the same (timestamp, values) samples as
+input_sampler.AxisSampler, so the task loop can use either source.
+
+pygame does not expose SDL's own event timestamps, so an event is stamped
+when the main loop takes it off the queue.
+"""
+import time
+
+import pygame
+
+# Events the task loops act on; everything else is kept off the queue.
+# Window events: repaint and focus (screen_pacing.py).
+TASK_EVENTS = (pygame.QUIT, pygame.KEYDOWN,
+               pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED,
+               pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED)
+
+
+def filter_events(axis_events):
+    """
+    Only let the events the task uses onto the queue.
+
+    With `axis_events` False, JOYAXISMOTION is blocked too so the queue
+    doesn't fill with motion nobody reads during long sessions.
+    """
+    pygame.event.set_blocked(None)
+    allowed = list(TASK_EVENTS)
+    if axis_events:
+        allowed.append(pygame.JOYAXISMOTION)
+    pygame.event.set_allowed(allowed)
+
+
+class AxisEventState:
+    """Current axis values of one joystick, maintained from JOYAXISMOTION."""
+
+    def __init__(self, joystick):
+        self.joystick = joystick
+        self.instance_id = joystick.get_instance_id()
+        self.num_axes = joystick.get_numaxes()
+        self.values = [0.0] * self.num_axes
+        self.events = 0       # JOYAXISMOTION events consumed so far
+        # listener(timestamp, values) after every change, as in AxisSampler
+        # (called from the main loop, so only as often as it handles events)
+        self.listener = None
+        self._pending = []
+        self.resync()
+
+    def start(self):
+        self.resync()
+
+    def stop(self):
+        pass
+
+    def resync(self):
+        """Read every axis once, e.g. after events were not being handled."""
+        for i in range(self.num_axes):
+            self.values[i] = self.joystick.get_axis(i)
+
+    def handle(self, event):
+        """Apply a JOYAXISMOTION event; returns False for anything else."""
+        if event.type != pygame.JOYAXISMOTION or event.instance_id != self.instance_id:
+            return False
+        # The old values held right up to this change
+        now = time.perf_counter()
+        self._pending.append((now, tuple(self.values)))
+        self.values[event.axis] = event.value
+        self.events += 1
+        if self.listener is not None:
+            self.listener(now, self.values)
+        return True
+
+    def drain(self):
+        """
+        (timestamp, values) samples since the last drain(), ending with the
+        current values at the current time.
+
+        Each sample carries the values that held since the previous sample,
+        which is how the task loop integrates them.
+        """
+        samples = self._pending
+        samples.append((time.perf_counter(), tuple(self.values)))
+        self._pending = []
+        return samples
+
+    def discard(self):
+        """Drop pending samples and re-read the axes (e.g. after a pause screen)."""
+        self._pending = []
+        self.resync()
@@ -0,0 +1,147 @@
+"""
+Frame-time profiler and on-screen performance overlay.
+
+The task loop calls start_frame() right after clock.tick() and mark() at
+the end of each phase (events, update, draw, flip). The last `window`
+frames are kept in ring buffers for rolling p50/p95/p99, and every frame
+also goes into a fixed-size latency.LatencyHistogram for the session
+summary. A frame that takes more than 1.5 frame periods counts the frames
+it swallowed as dropped.
+
+Press F3 in the task to toggle the overlay.
+"""
+import time
+from array import array
+
+from latency import LatencyHistogram
+from output_files import write_json
+
+PHASES = ("events", "update", "draw", "flip")
+
+
+def _percentiles(values):
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return tuple(ordered[round(q * last)] for q in (0.5, 0.95, 0.99))
+
+
+class FrameProfiler:
+    """Per-frame phase timings with rolling and whole-session statistics."""
+
+    def __init__(self, frame_rate, window=600, overlay_refresh=0.5):
+        # No frame is "dropped" when the frame rate is uncapped (0)
+        self.period_ns = 1e9 / frame_rate if frame_rate else None
+        self.window = window
+        self.overlay_refresh = overlay_refresh
+        self.show_overlay = False
+
+        # Milliseconds of the last `window` frames (ring buffers)
+        self._frame_ms = array("d", bytes(8 * window))
+        self._phase_ms = {phase: array("d", bytes(8 * window)) for phase in PHASES}
+        self._filled = 0
+        self._pos = 0
+
+        self.session = {name: LatencyHistogram() for name in ("frame",) + PHASES}
+        self.frames = 0
+        self.dropped = 0
+
+        self._frame_start = None
+        self._mark = 0
+        self._current = dict.fromkeys(PHASES, 0)
+        self._skip = False
+        self._overlay_lines = []
+        self._overlay_time = 0.0
+
+    def start_frame(self):
+        """Call once per frame, right after clock.tick()."""
+        now = time.perf_counter_ns()
+        if self._frame_start is not None and not self._skip:
+            self._record(now - self._frame_start)
+        self._frame_start = self._mark = now
+        self._skip = False
+
+    def mark(self, phase):
+        """End `phase` (one of PHASES) of the current frame."""
+        now = time.perf_counter_ns()
+        self._current[phase] = now - self._mark
+        self._mark = now
+
+    def skip_frame(self):
+        """Leave the current frame out (e.g. it showed the pause screen)."""
+        self._skip = True
+
+    def _record(self, interval_ns):
+        pos = self._pos
+        self._frame_ms[pos] = interval_ns / 1e6
+        self.session["frame"].add(interval_ns // 1000)
+        for phase in PHASES:
+            duration = self._current[phase]
+            self._phase_ms[phase][pos] = duration / 1e6
+            self.session[phase].add(duration // 1000)
+        self._pos = (pos + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+
+        self.frames += 1
+        if self.period_ns and interval_ns > 1.5 * self.period_ns:
+            self.dropped += max(1, round(interval_ns / self.period_ns) - 1)
+
+    def rolling(self):
+        """{"frame"/phase: (p50, p95, p99) in ms} over the last `window` frames."""
+        if not self._filled:
+            return {}
+        n = self._filled
+        stats = {"frame": _percentiles(self._frame_ms[:n])}
+        for phase in PHASES:
+            stats[phase] = _percentiles(self._phase_ms[phase][:n])
+        return stats
+
+    # --------------------------------------------------------------------------
+    # Overlay
+    # --------------------------------------------------------------------------
+    def toggle_overlay(self):
+        self.show_overlay = not self.show_overlay
+
+    def draw_overlay(self, renderer, text, pos):
+        """Queue the overlay lines on a DirtyRenderer (refreshed a few times a second)."""
+        if not self.show_overlay:
+            return
+        now = time.perf_counter()
+        if now - self._overlay_time >= self.overlay_refresh:
+            self._overlay_time = now
+            stats = self.rolling()
+            if stats:
+                frame = stats["frame"]
+                self._overlay_lines = [
+                    ("Frame ms p50 ", (frame[0], ".1f"), " p95 ", (frame[1], ".1f"),
+                     " p99 ", (frame[2], ".1f"), "  Dropped ", self.dropped),
+                    tuple(part for phase in PHASES
+                          for part in (f"{phase} ", (stats[phase][1], ".2f"), "  ")) +
+                    ("(p95 ms)",),
+                ]
+        x, y = pos
+        for i, parts in enumerate(self._overlay_lines):
+            renderer.text_line(text, (x, y + i * 30), parts)
+
+    # --------------------------------------------------------------------------
+    # Session summary
+    # --------------------------------------------------------------------------
+    def summary(self):
+        return {
+            "frames": self.frames,
+            "dropped_frames": self.dropped,
+            "target_frame_ms": self.period_ns / 1e6 if self.period_ns else None,
+            "phases": {name: h.summary() for name, h in self.session.items()},
+        }
+
+    def dump(self, path):
+        write_json(path, self.summary())
+
+    def report(self):
+        target = f"{self.period_ns / 1e6:.2f}ms" if self.period_ns else "uncapped"
+        print(f"  {self.frames} frames, {self.dropped} dropped (target {target})")
+        for name, h in self.session.items():
+            if h.count:
+                print(f"  {name}: p50 {h.quantile(0.5) / 1000:.2f}ms  "
+                      f"p95 {h.quantile(0.95) / 1000:.2f}ms  "
+                      f"p99 {h.quantile(0.99) / 1000:.2f}ms  "
+                      f"max {h.max / 1000:.2f}ms")
@@ -0,0 +1,120 @@
+"""
+High-rate controller sampling on a background thread.
+
+AxisSampler reads every controller axis on its own schedule (1000 Hz by
+default) and stores each sample with a time.perf_counter() timestamp in a
+preallocated ring buffer. The render loop drains whatever arrived since the
+last frame and integrates every sample, so lock detection and travel
+distance no longer depend on 1/60 s snapshots.
+
+Note on pygame joysticks: SDL refreshes joystick state when events are
+pumped. Set the SDL_JOYSTICK_THREAD=1 hint before pygame.init() (both task
+scripts do) so Windows reads the device on SDL's own thread; elsewhere the
+values read here only change as fast as the main loop pumps events.
+"""
+import threading
+import time
+from array import array
+
+
+class AxisRingBuffer:
+    """Fixed-size ring of (timestamp, axis values) samples, one writer."""
+
+    def __init__(self, num_axes, capacity=8192):
+        self.num_axes = num_axes
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity * num_axes))
+        self.written = 0      # total samples ever pushed
+        self._lock = threading.Lock()
+
+    def push(self, timestamp, values):
+        n = self.num_axes
+        with self._lock:
+            slot = self.written % self.capacity
+            self.timestamps[slot] = timestamp
+            base = slot * n
+            for i in range(n):
+                self.values[base + i] = values[i]
+            self.written += 1
+
+    def read(self, cursor):
+        """
+        Samples pushed since `cursor` (a previous `written` value).
+
+        Returns (new_cursor, samples, dropped) where samples is a list of
+        (timestamp, values_tuple) and dropped counts samples that were
+        overwritten before they could be read.
+        """
+        n = self.num_axes
+        with self._lock:
+            end = self.written
+            start = max(cursor, end - self.capacity)
+            samples = []
+            for seq in range(start, end):
+                slot = seq % self.capacity
+                base = slot * n
+                samples.append((self.timestamps[slot],
+                                tuple(self.values[base:base + n])))
+        return end, samples, start - cursor
+
+
+class AxisSampler:
+    """Samples `read_values()` at `rate_hz` into an AxisRingBuffer."""
+
+    def __init__(self, read_values, num_axes, rate_hz=1000, capacity=8192):
+        self.read_values = read_values
+        self.period = 1.0 / rate_hz
+        self.buffer = AxisRingBuffer(num_axes, capacity)
+        self.dropped = 0
+        self.error = None     # exception that stopped the thread, if any
+        # Called as listener(timestamp, values) on the sampling thread for
+        # every sample (e.g. arm_stream.ArmStreamer.update)
+        self.listener = None
+        self._cursor = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="AxisSampler",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def drain(self):
+        """All (timestamp, values) samples taken since the last drain()."""
+        self._cursor, samples, dropped = self.buffer.read(self._cursor)
+        self.dropped += dropped
+        return samples
+
+    def discard(self):
+        """Skip everything sampled so far (e.g. after a pause screen)."""
+        self._cursor = self.buffer.written
+
+    def _run(self):
+        period = self.period
+        next_time = time.perf_counter()
+        try:
+            while self._running:
+                now = time.perf_counter()
+                values = self.read_values()
+                self.buffer.push(now, values)
+                if self.listener is not None:
+                    self.listener(now, values)
+                next_time += period
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -period:
+                    # Fell behind (e.g. the OS parked the thread); don't
+                    # try to catch up with a burst of back-to-back reads.
+                    next_time = time.perf_counter()
+        except Exception as exc:
+            self.error = exc
+            self._running = False
@@ -0,0 +1,153 @@
+"""
+Input-to-display latency instrumentation.
+
+Every frame the task loop stamps its stages with time.perf_counter_ns():
+the controller samples it integrated (taken by input_sampler or
+event_input), the end of the state update, the end of drawing into the
+back buffer and the return of the display update/flip. LatencyTracker
+turns those into per-stage latencies and adds them to fixed-size
+histograms, so a session of any length costs the same small amount of
+memory. dump() writes the histograms and their percentiles as JSON next to
+the trial records.
+
+"Input" is the timestamp of a sample, not of the physical movement: the
+USB/driver delay before SDL sees the change is not included, and in
+"events" mode a change is stamped when the loop takes its JOYAXISMOTION
+event off the queue. "Display" is when the flip returns, not when the
+panel shows the pixels.
+"""
+from array import array
+
+from output_files import write_json
+
+# Histogram resolution: exact below 2*SUB_BUCKETS us, then SUB_BUCKETS
+# buckets per power of two (about 3% relative precision)
+SUB_BUCKETS = 32
+MAX_SHIFT = 24                       # top bucket starts around 17 s
+
+STAGES = (
+    "input_to_update",           # oldest sample of the frame -> state updated
+    "update_to_draw",            # state updated -> frame drawn in the back buffer
+    "draw_to_flip",              # drawn -> display update/flip returned
+    "input_to_display",          # oldest sample of the frame -> flip returned
+    "newest_input_to_display",   # newest sample of the frame -> flip returned
+)
+
+
+def _bucket(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = min(value.bit_length() - 6, MAX_SHIFT)
+    return min(SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS,
+               SUB_BUCKETS * (MAX_SHIFT + 2) - 1)
+
+
+def _bucket_start(index):
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+
+
+def _bucket_end(index):
+    if index < 2 * SUB_BUCKETS:
+        return index + 1
+    return _bucket_start(index) + (1 << (index // SUB_BUCKETS - 1))
+
+
+class LatencyHistogram:
+    """Fixed-memory log-linear histogram of durations in microseconds."""
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * SUB_BUCKETS * (MAX_SHIFT + 2)))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, micros):
+        micros = max(0, micros)
+        self.counts[_bucket(micros)] += 1
+        self.count += 1
+        self.total += micros
+        if self.min is None or micros < self.min:
+            self.min = micros
+        if self.max is None or micros > self.max:
+            self.max = micros
+
+    def quantile(self, q):
+        """Approximate q-quantile in microseconds (middle of its bucket)."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen > rank:
+                middle = (_bucket_start(index) + _bucket_end(index) - 1) / 2
+                return min(max(middle, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count,
+            "min_us": self.min,
+            "p50_us": self.quantile(0.5),
+            "p95_us": self.quantile(0.95),
+            "p99_us": self.quantile(0.99),
+            "max_us": self.max,
+        }
+
+    def buckets(self):
+        """[(bucket start in us, count), ...] for the non-empty buckets."""
+        return [(_bucket_start(i), n) for i, n in enumerate(self.counts) if n]
+
+
+class LatencyTracker:
+    """Per-stage latency histograms for the task loop."""
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.frames = 0
+
+    def frame(self, oldest_input, newest_input, updated_ns, drawn_ns, flipped_ns):
+        """
+        Record one displayed frame.
+
+        `oldest_input`/`newest_input` are the perf_counter() timestamps (in
+        seconds) of the first and last sample integrated this frame; the
+        other stages are perf_counter_ns() values.
+        """
+        oldest_ns = int(oldest_input * 1e9)
+        newest_ns = int(newest_input * 1e9)
+        h = self.histograms
+        h["input_to_update"].add((updated_ns - oldest_ns) // 1000)
+        h["update_to_draw"].add((drawn_ns - updated_ns) // 1000)
+        h["draw_to_flip"].add((flipped_ns - drawn_ns) // 1000)
+        h["input_to_display"].add((flipped_ns - oldest_ns) // 1000)
+        h["newest_input_to_display"].add((flipped_ns - newest_ns) // 1000)
+        self.frames += 1
+
+    def summary(self):
+        return {stage: h.summary() for stage, h in self.histograms.items()}
+
+    def dump(self, path, metadata=None):
+        """Write the summaries and histogram buckets as JSON."""
+        write_json(path, {
+            "metadata": metadata or {},
+            "frames": self.frames,
+            "stages": {stage: dict(h.summary(), buckets=h.buckets())
+                       for stage, h in self.histograms.items()},
+        })
+
+    def report(self):
+        """Print the percentiles of each stage in milliseconds."""
+        for stage, h in self.histograms.items():
+            if h.count:
+                print(f"  {stage}: p50 {h.quantile(0.5) / 1000:.2f}ms  "
+                      f"p95 {h.quantile(0.95) / 1000:.2f}ms  "
+                      f"p99 {h.quantile(0.99) / 1000:.2f}ms  "
+                      f"max {h.max / 1000:.2f}ms")
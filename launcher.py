@@ -0,0 +1,116 @@
+"""
+Launcher for the task scripts.
+
+    python launcher.py                          # circle/square task, lab defaults
+    python launcher.py --windowed --resolution 1600x900
+    python launcher.py --logical 1920x1080 --render-scale 0.5   # 4K panel, 960x540 drawn
+    python launcher.py --config participant_07.json --set TARGET_REACH_THRESHOLD=20
+    python launcher.py reach                    # testing software.py
+    python launcher.py --headless               # SDL dummy video driver, no window
+
+--config is a JSON object of TrialConfig overrides, e.g.
+{"INPUT_MODE": "events", "SESSION_SEED": 1234, "LAYOUT_BANK": "bank.lbk"}.
+Only the display, joystick and font subsystems are initialized (see
+startup.py), and the startup time is printed once the first screen is up.
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+
+SCRIPTS = {
+    "lock": "6axis lock.py",
+    "reach": "testing software.py",
+}
+# The TrialConfig settings testing software.py uses; the rest only exist
+# in the circle/square task
+REACH_SETTINGS = ("FULLSCREEN", "SCREEN_WIDTH", "SCREEN_HEIGHT", "CALIBRATION_PATH",
+                  "FILTER_MIN_CUTOFF", "FILTER_BETA", "FILTER_D_CUTOFF", "NOISE_DEADBAND")
+
+
+def load_script(name):
+    """Import one of the task scripts (their file names aren't module names)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPTS[name])
+    spec = importlib.util.spec_from_file_location(name.replace(" ", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_resolution(value):
+    try:
+        width, height = (int(v) for v in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {value!r}")
+    return width, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the 6-axis controller test harness")
+    parser.add_argument("task", nargs="?", choices=sorted(SCRIPTS), default="lock",
+                        help="lock = circle/square task (default), reach = testing software")
+    parser.add_argument("--resolution", type=parse_resolution, default=(0, 0),
+                        metavar="WxH", help="Screen or window size (default: native / 1280x720)")
+    parser.add_argument("--logical", type=parse_resolution, default=(0, 0), metavar="WxH",
+                        help="Task coordinate space, scaled to the display (default: its size)")
+    parser.add_argument("--render-scale", type=float, default=None,
+                        help="Internal render resolution relative to --logical")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--fullscreen", dest="fullscreen", action="store_true", default=None)
+    mode.add_argument("--windowed", dest="fullscreen", action="store_false")
+    parser.add_argument("--headless", action="store_true",
+                        help="Use SDL's dummy video driver (no window)")
+    parser.add_argument("--config", help="JSON file of TrialConfig overrides")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a TrialConfig parameter (repeatable)")
+    args = parser.parse_args()
+
+    if args.headless:
+        # Must be set before pygame initializes the display
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+
+    from startup import StartupTimer
+    from trial_engine import TrialConfig, parse_overrides
+
+    overrides = {}
+    if args.config:
+        with open(args.config) as f:
+            overrides.update(json.load(f))
+    try:
+        overrides.update(parse_overrides(args.set))
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.fullscreen is not None:
+        overrides["FULLSCREEN"] = args.fullscreen
+    if args.headless:
+        overrides["FULLSCREEN"] = False
+    if any(args.resolution):
+        overrides["SCREEN_WIDTH"], overrides["SCREEN_HEIGHT"] = args.resolution
+    if any(args.logical):
+        overrides["LOGICAL_WIDTH"], overrides["LOGICAL_HEIGHT"] = args.logical
+    if args.render_scale is not None:
+        overrides["RENDER_SCALE"] = args.render_scale
+    if args.task == "reach":
+        unused = sorted(set(overrides) - set(REACH_SETTINGS))
+        if unused:
+            parser.error(f"The reach task doesn't use {', '.join(unused)}")
+
+    try:
+        config = TrialConfig(**overrides)
+    except TypeError as exc:
+        parser.error(str(exc))
+
+    timer = StartupTimer(STARTED)
+    script = load_script(args.task)
+    timer.mark("imports")
+
+    script.main(config, timer)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Precomputed, seeded trial layout banks.
+
+A bank holds thousands of valid layouts for one screen resolution and one
+set of layout constraints, built ahead of time with
+trial_layout.sample_layouts(). A session then draws its layouts from the
+bank in a seeded order, so generating a layout costs nothing between
+trials and every participant given the same bank and seed gets the same
+sequence of layouts.
+
+    python layout_bank.py bank_1920x1080.lbk --width 1920 --height 1080 --count 10000
+    (then run the task with LAYOUT_BANK = "bank_1920x1080.lbk")
+
+File layout: a HEADER_SIZE JSON header (screen size, layout constraints,
+count), then the layouts as int16 (count, 12), the difficulty features as
+float32 (count, len(FEATURES)) and, per feature, the uint32 layout order
+sorted by that feature (the difficulty index).
+"""
+import argparse
+import json
+import os
+import random
+
+import numpy as np
+
+from output_files import make_parent_dir
+from trial_engine import TrialConfig, parse_overrides
+from trial_layout import sample_layouts, randomize_new_trial
+
+HEADER_SIZE = 4096
+FORMAT_NAME = "6axis-layout-bank"
+
+# TrialConfig parameters that shape a layout; a bank only fits sessions
+# that use the same values
+LAYOUT_PARAMETERS = ("RED_RADIUS_MIN", "RED_RADIUS_MAX", "GREEN_RADIUS_MIN",
+                     "GREEN_RADIUS_MAX", "RED_SQUARE_MIN", "RED_SQUARE_MAX",
+                     "MIN_START_DISTANCE", "MIN_RADIUS_DIFFERENCE", "MIN_ELEMENT_DISTANCE")
+
+# Difficulty features indexed for every layout
+FEATURES = ("circle_distance", "square_distance", "radius_difference", "square_side")
+
+
+def layout_features(layouts):
+    """(count, len(FEATURES)) difficulty features of (count, 12) layouts."""
+    layouts = np.asarray(layouts, dtype=np.float64)
+    (r_red, rcx, rcy, r_green, gcx, gcy,
+     rs_side, rsx, rsy, _, gsx, gsy) = layouts.T
+    return np.column_stack([
+        np.hypot(gcx - rcx, gcy - rcy),
+        np.hypot(gsx - rsx, gsy - rsy),
+        np.abs(r_red - r_green),
+        rs_side,
+    ]).astype(np.float32)
+
+
+class LayoutBank:
+    """Layouts for one screen size, with a per-feature difficulty index."""
+
+    def __init__(self, layouts, screen_width, screen_height, layout_config, seed=None,
+                 features=None, order=None):
+        self.layouts = np.asarray(layouts, dtype=np.int16)
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.layout_config = dict(layout_config)
+        self.seed = seed
+        # Computed on build, read back from the file on load
+        if features is None:
+            features = layout_features(self.layouts)
+        if order is None:
+            order = np.argsort(features, axis=0, kind="stable").T.astype(np.uint32)
+        self.features = features
+        self.order = order
+
+    @classmethod
+    def build(cls, config, screen_width, screen_height, count, seed=None):
+        rng = np.random.default_rng(seed)
+        layouts = sample_layouts(config, screen_width, screen_height, count, rng)
+        return cls(layouts, screen_width, screen_height,
+                   {name: getattr(config, name) for name in LAYOUT_PARAMETERS}, seed)
+
+    def __len__(self):
+        return len(self.layouts)
+
+    def save(self, path):
+        header = json.dumps({
+            "format": FORMAT_NAME,
+            "count": len(self),
+            "screen_width": self.screen_width,
+            "screen_height": self.screen_height,
+            "layout_config": self.layout_config,
+            "seed": self.seed,
+            "features": FEATURES,
+        }).encode()
+        if len(header) > HEADER_SIZE:
+            raise ValueError("Layout bank header too large")
+        make_parent_dir(path)
+        with open(path, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b" "))
+            f.write(self.layouts.tobytes())
+            f.write(self.features.tobytes())
+            f.write(self.order.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            header = json.loads(f.read(HEADER_SIZE))
+            if header.get("format") != FORMAT_NAME:
+                raise ValueError(f"{path} is not a layout bank")
+            count = header["count"]
+            width = len(FEATURES)
+            layouts = np.fromfile(f, dtype=np.int16, count=count * 12).reshape(count, 12)
+            features = np.fromfile(f, dtype=np.float32, count=count * width)
+            order = np.fromfile(f, dtype=np.uint32, count=count * width)
+        if len(order) != count * width:
+            raise ValueError(f"{path} is truncated")
+        return cls(layouts, header["screen_width"], header["screen_height"],
+                   header["layout_config"], header["seed"],
+                   features.reshape(count, width), order.reshape(width, count))
+
+    def check(self, config, screen_width, screen_height):
+        """Raise ValueError if the bank was built for another screen or constraints."""
+        if (screen_width, screen_height) != (self.screen_width, self.screen_height):
+            raise ValueError(f"Layout bank is for {self.screen_width}x{self.screen_height}, "
+                             f"the screen is {screen_width}x{screen_height}")
+        for name in LAYOUT_PARAMETERS:
+            if getattr(config, name) != self.layout_config.get(name):
+                raise ValueError(f"Layout bank was built with {name}="
+                                 f"{self.layout_config.get(name)}, "
+                                 f"the session uses {getattr(config, name)}")
+
+    def select(self, **ranges):
+        """
+        Indices of the layouts whose features fall in the given ranges, e.g.
+        select(circle_distance=(200, 600), square_side=(50, 100)).
+        Bounds are inclusive; use None for an open end.
+        """
+        selected = None
+        for name, (low, high) in ranges.items():
+            if name not in FEATURES:
+                raise ValueError(f"Unknown layout feature: {name}")
+            column = FEATURES.index(name)
+            order = self.order[column]
+            values = self.features[order, column]
+            start = 0 if low is None else np.searchsorted(values, low, side="left")
+            stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+            matches = order[start:stop]
+            selected = matches if selected is None else np.intersect1d(selected, matches)
+        if selected is None:
+            return np.arange(len(self), dtype=np.uint32)
+        return np.sort(selected)
+
+    def sequence(self, seed, indices=None):
+        """A LayoutSequence over the bank (or over `indices` from select())."""
+        return LayoutSequence(self, seed, indices)
+
+
+class LayoutSequence:
+    """Seeded walk through a layout bank; next() is O(1)."""
+
+    def __init__(self, bank, seed, indices=None):
+        self.bank = bank
+        self.indices = np.arange(len(bank)) if indices is None else np.asarray(indices)
+        if len(self.indices) == 0:
+            raise ValueError("No layouts to draw from")
+        self._rng = np.random.default_rng(seed)
+        self._order = self._rng.permutation(self.indices)
+        self._position = 0
+
+    def next(self):
+        """The next layout as a 12-tuple, reshuffling once the bank is used up."""
+        if self._position == len(self._order):
+            self._order = self._rng.permutation(self.indices)
+            self._position = 0
+        layout = self.bank.layouts[self._order[self._position]]
+        self._position += 1
+        return tuple(layout.tolist())
+
+
+def layout_source(config, screen_width, screen_height, seed):
+    """
+    A callable returning the session's next layout.
+
+    Draws from config.LAYOUT_BANK when one is set, otherwise generates
+    each layout with randomize_new_trial(); both are seeded by `seed`.
+    """
+    layout_rng = random.Random(seed)
+    if config.LAYOUT_BANK:
+        bank = LayoutBank.load(config.LAYOUT_BANK)
+        bank.check(config, screen_width, screen_height)
+        return bank.sequence(layout_rng.getrandbits(64)).next
+
+    return lambda: randomize_new_trial(config, screen_width, screen_height, layout_rng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a trial layout bank")
+    parser.add_argument("out", help="Bank file to write")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a layout parameter, e.g. MIN_START_DISTANCE=200")
+    args = parser.parse_args()
+
+    try:
+        config = TrialConfig(**parse_overrides(args.set))
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    try:
+        bank = LayoutBank.build(config, args.width, args.height, args.count, args.seed)
+    except ValueError as exc:
+        # The shapes don't fit on the screen
+        parser.error(str(exc))
+    bank.save(args.out)
+    print(f"Wrote {len(bank)} layouts for {args.width}x{args.height} to {args.out} "
+          f"({os.path.getsize(args.out)} bytes)")
+    for i, name in enumerate(FEATURES):
+        values = bank.features[:, i]
+        print(f"  {name}: min {values.min():.1f}  median {np.median(values):.1f}  "
+              f"max {values.max():.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Output file helpers shared by everything that writes session data.
+
+The default output paths (RECORD_PATH, TELEMETRY_PATH, ...) point into a
+folder that may not exist yet on a fresh lab machine, so every writer
+creates the parent folder first.
+"""
+import json
+import os
+
+
+def make_parent_dir(path):
+    """Create the folder `path` goes in, if it has one and it is missing."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def write_json(path, data):
+    """Write `data` as indented JSON to `path`, creating its folder."""
+    make_parent_dir(path)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
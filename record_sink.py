@@ -0,0 +1,113 @@
+"""
+Crash-safe streaming output for trial records.
+
+RecordSink appends each record as soon as it is handed over, so a crash or
+power cut loses at most the trial in flight instead of the whole session.
+write() only puts the row on a bounded queue; a background thread does the
+formatting and file I/O, flushing every row and fsync'ing periodically, so
+the render thread never touches the disk.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from output_files import make_parent_dir
+
+_STOP = object()
+
+
+class RecordSink:
+    """Writes rows to a CSV or JSONL file from a background thread."""
+
+    def __init__(self, path, header, fmt=None, append=False,
+                 max_pending=1024, fsync_interval=1.0):
+        self.path = path
+        self.columns = header.split(",")
+        self.header = header
+        # "csv" or "jsonl"; by default picked from the file extension
+        if fmt is None:
+            fmt = "jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv"
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError(f"Unknown record format: {fmt}")
+        self.fmt = fmt
+        self.append = append
+        self.fsync_interval = fsync_interval
+
+        self.count = 0        # rows handed to write()
+        self.error = None     # exception that stopped the writer, if any
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="RecordSink",
+                                        daemon=True)
+        self._thread.start()
+        # Make sure queued rows reach the disk even on sys.exit()
+        atexit.register(self.close)
+
+    def write(self, row):
+        """Queue one row (a sequence matching the header columns)."""
+        self.count += 1
+        self._queue.put(row)
+
+    def close(self):
+        """Write everything still queued, fsync and stop the writer."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        atexit.unregister(self.close)
+        if self.error is not None:
+            print(f"Writing {self.path} failed: {self.error}")
+
+    def _format(self, row):
+        if self.fmt == "jsonl":
+            return json.dumps(dict(zip(self.columns, row))) + "\n"
+        return ",".join(map(str, row)) + "\n"
+
+    def _run(self):
+        f = None
+        last_sync = time.monotonic()
+        dirty = False
+        try:
+            while True:
+                try:
+                    row = self._queue.get(timeout=self.fsync_interval)
+                except queue.Empty:
+                    row = None
+
+                if row is _STOP:
+                    break
+                if row is not None:
+                    if f is None:
+                        # Opened on the first row, so a session with no
+                        # completed trials leaves no file behind.
+                        f = self._open()
+                    f.write(self._format(row))
+                    f.flush()
+                    dirty = True
+
+                if dirty and time.monotonic() - last_sync >= self.fsync_interval:
+                    os.fsync(f.fileno())
+                    last_sync = time.monotonic()
+                    dirty = False
+        except Exception as exc:
+            self.error = exc
+            # Keep draining so write() never blocks on a dead writer
+            while self._queue.get() is not _STOP:
+                pass
+        finally:
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+    def _open(self):
+        make_parent_dir(self.path)
+        new_file = not self.append or not os.path.exists(self.path) \
+            or os.path.getsize(self.path) == 0
+        f = open(self.path, "a" if self.append else "w")
+        if new_file and self.fmt == "csv":
+            f.write(self.header + "\n")
+        return f
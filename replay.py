@@ -0,0 +1,250 @@
+"""
+Deterministic replay of recorded sessions.
+
+A session's telemetry file (telemetry.py) holds every raw axis sample with
+its timestamp, plus the layout seed, screen size, TrialConfig and axis
+calibration in its header. SessionReplay filters those samples like the
+live task did (calibration.py) and feeds them through trial_engine.step()
+on a virtual clock, regenerating each trial's layout from the recorded seed
+(and layout bank, if the session used one), so a session can be re-scored
+under different thresholds or used to check that a logic change still
+reproduces the recorded trajectories.
+
+    python replay.py session.tlm [more.tlm ...] --set TARGET_REACH_THRESHOLD=20
+    python replay.py session.tlm --render            # watch it at 1x
+    python replay.py session.tlm --render --speed 4  # or faster
+
+Headless replays run as fast as the CPU allows.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from telemetry import load_telemetry, read_telemetry_header
+from trial_engine import (TrialConfig, TrialState, RECORD_HEADER, parse_overrides,
+                          FixedStepIntegrator, lock_time, trial_record)
+from layout_bank import layout_source
+from calibration import AxisFilter, calibrations_from_dict
+
+SCORE_COLUMN = RECORD_HEADER.split(",").index("Score")
+
+
+class VirtualClock:
+    """Session time taken from the recording instead of the wall clock."""
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def advance_to(self, timestamp):
+        self.time = timestamp
+
+
+class SessionReplay:
+    """Re-runs one recorded session through the trial logic."""
+
+    def __init__(self, path, overrides=None):
+        header = read_telemetry_header(path)
+        metadata = header["metadata"]
+        if "seed" not in metadata:
+            raise ValueError(f"{path} has no session seed; it can't be replayed")
+
+        self.path = path
+        self.seed = metadata["seed"]
+        self.screen_width = metadata["screen_width"]
+        self.screen_height = metadata["screen_height"]
+        recorded = dict(metadata["config"])
+        if "PHYSICS_RATE" not in recorded:
+            # Recorded before sensitivities were in pixels per second
+            for name in ("CIRCLE_POSITION_SENSITIVITY", "SQUARE_POSITION_SENSITIVITY",
+                         "SIZE_SENSITIVITY"):
+                recorded[name] *= recorded["FRAME_RATE"]
+        if "FILTER_MIN_CUTOFF" not in recorded:
+            # Recorded before axis calibration/filtering
+            recorded.update(FILTER_MIN_CUTOFF=0.0, NOISE_DEADBAND=0.0)
+        # Recorded while the task loop also idled on a still scene
+        recorded.pop("IDLE_AFTER", None)
+        self.recorded_config = TrialConfig(**recorded)
+        self.config = TrialConfig(**dict(recorded, **(overrides or {})))
+        self.calibrations = calibrations_from_dict(metadata.get("calibration", {}))
+        self.clock = VirtualClock()
+
+        self.columns = load_telemetry(path)
+        self.num_axes = sum(1 for name in self.columns if name.startswith("axis"))
+
+    def run(self, on_sample=None):
+        """
+        Replay every recorded trial.
+
+        Each trial gets exactly its own recorded samples, so a trial that
+        locks earlier under new settings ignores the rest of them and one
+        that never locks is reported as incomplete. `on_sample(trial_number,
+        state)` is called after every step (used for rendering).
+
+        Returns (records, incomplete_trials, max_deviation) where
+        max_deviation is the largest difference in px between replayed and
+        recorded positions/radius (0.0 means a bit-exact reproduction).
+        """
+        config = self.config
+        cols = self.columns
+        times = cols["time"].tolist()
+        trials = cols["trial"].astype(np.int64)
+        starts = cols["trial_start"].tolist()
+        raw_axes = np.column_stack([cols[f"axis{i}"] for i in range(self.num_axes)]).tolist()
+        # Every recorded sample went through the live filter, including the
+        # ones a re-scored trial no longer reaches, so filter them all
+        axis_filter = AxisFilter.from_config(config.axis_indices(), self.calibrations, config)
+        axes = [axis_filter.process(t, values) for t, values in zip(times, raw_axes)]
+        recorded = np.column_stack([cols["circle_x"], cols["circle_y"],
+                                    cols["green_circle_radius"],
+                                    cols["square_x"], cols["square_y"]]).tolist()
+
+        next_layout = layout_source(config, self.screen_width, self.screen_height, self.seed)
+        layouts_made = 0
+        integrator = FixedStepIntegrator(config, self.screen_width, self.screen_height)
+        records = []
+        incomplete = []
+        max_deviation = 0.0
+
+        # Row ranges belonging to each recorded trial
+        bounds = np.flatnonzero(np.diff(trials)) + 1
+        segments = zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(trials)].tolist())
+
+        for begin, end in segments:
+            if begin == end:
+                continue
+            trial_number = int(trials[begin])
+            # Keep the layout generator in step with the recorded session
+            while layouts_made < trial_number:
+                layout = next_layout()
+                layouts_made += 1
+            state = TrialState(layout)
+            integrator.reset(state)
+            trial_start = last_time = starts[begin]
+
+            done = False
+            for row in range(begin, end):
+                sample_time = times[row]
+                self.clock.advance_to(sample_time)
+                dt = max(0.0, sample_time - last_time)
+                last_time = sample_time
+                done = integrator.advance(state, axes[row], dt)
+
+                rx, ry, rr, sx, sy = recorded[row]
+                deviation = max(abs(state.circle_x - rx), abs(state.circle_y - ry),
+                                abs(state.green_circle_radius - rr),
+                                abs(state.square_x - sx), abs(state.square_y - sy))
+                if deviation > max_deviation:
+                    max_deviation = deviation
+
+                if on_sample is not None:
+                    on_sample(trial_number, state)
+                if done:
+                    break
+
+            if done:
+                # The recording has no frame boundaries, so FrameTime
+                # becomes the time of the locking sample
+                records.append(trial_record(trial_number, state, lock_time(state),
+                                            config, sample_time - trial_start))
+            else:
+                incomplete.append(trial_number)
+
+        return records, incomplete, max_deviation
+
+
+def render_replay(replay, speed):
+    """Replay with the task's own drawing, paced at `speed` x real time."""
+    import pygame
+    from dirty_render import DirtyRenderer
+    from task_view import draw_task
+    from text_cache import TextCache
+
+    pygame.init()
+    screen = pygame.display.set_mode((replay.screen_width, replay.screen_height))
+    pygame.display.set_caption(f"Replay: {replay.path}")
+    renderer = DirtyRenderer(screen)
+    text = TextCache(pygame.font.SysFont(None, 36))
+
+    frame_period = 1.0 / (replay.config.FRAME_RATE or 60)
+    pacing = {"wall_start": None, "virtual_start": 0.0, "next_frame": 0.0}
+
+    def on_sample(trial_number, state):
+        now = replay.clock.now()
+        if pacing["wall_start"] is None:
+            pacing["wall_start"] = time.perf_counter()
+            pacing["virtual_start"] = pacing["next_frame"] = now
+        if now < pacing["next_frame"]:
+            return
+        pacing["next_frame"] = now + frame_period * speed
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or \
+               (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                sys.exit()
+
+        draw_task(renderer, text, state, trial_number)
+        renderer.present()
+
+        # Wait until the wall clock catches up with the recording
+        due = pacing["wall_start"] + (now - pacing["virtual_start"]) / speed
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    try:
+        return replay.run(on_sample)
+    finally:
+        pygame.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions")
+    parser.add_argument("sessions", nargs="+", help="Telemetry files (.tlm)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a recorded TrialConfig parameter (repeatable)")
+    parser.add_argument("--render", action="store_true",
+                        help="Draw the replay in a window instead of running headless")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Playback speed when rendering (1 = real time)")
+    parser.add_argument("--out", help="Write the re-scored trial records to this CSV")
+    args = parser.parse_args()
+
+    try:
+        overrides = parse_overrides(args.set)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    out = open(args.out, "w") if args.out else None
+    if out:
+        out.write("Session," + RECORD_HEADER + "\n")
+
+    for path in args.sessions:
+        replay = SessionReplay(path, overrides)
+        started = time.perf_counter()
+        if args.render:
+            records, incomplete, deviation = render_replay(replay, args.speed)
+        else:
+            records, incomplete, deviation = replay.run()
+        elapsed = time.perf_counter() - started
+
+        scores = [row[SCORE_COLUMN] for row in records]
+        mean_score = sum(scores) / len(scores) if scores else float("nan")
+        print(f"{path}: {len(records)} trials, {len(incomplete)} incomplete, "
+              f"mean score {mean_score:.2f}, max deviation {deviation:.3g}px "
+              f"({elapsed:.2f}s)")
+        if out:
+            for row in records:
+                out.write(path + "," + ",".join(map(str, row)) + "\n")
+
+    if out:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Frame pacing for the task's static screens.
+
+Static screens (start, pause) used to be redrawn in a loop, the start
+screen with no clock.tick() at all, which kept a core at 100% until the
+operator pressed a key. wait_for_key() draws a static screen once and then
+blocks in pygame.event.wait() until a key arrives, redrawing only when the
+window has to be repainted.
+
+FramePacer picks the task loop's frame rate: FRAME_RATE while the window
+has focus, and IDLE_FRAME_RATE while it doesn't, so a session left in the
+background doesn't keep the machine at full clock and thermal-throttle
+laptops. The loop is inside a timed trial the whole time, so it never
+slows down while focused: a lower rate would pump SDL's joystick and event
+state less often and delay the samples response times come from. Without
+focus SDL delivers no joystick input at all (unless
+SDL_JOYSTICK_ALLOW_BACKGROUND_EVENTS is set), so there is nothing to delay.
+"""
+import pygame
+
+# Window events that mean the screen contents were lost
+REPAINT_EVENTS = (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED, pygame.WINDOWSIZECHANGED)
+# Window events the pacing acts on (event_input.filter_events lets them through)
+WINDOW_EVENTS = REPAINT_EVENTS + (pygame.WINDOWFOCUSLOST, pygame.WINDOWFOCUSGAINED)
+
+
+def wait_for_key(draw, keys, background=None):
+    """
+    Show a static screen until one of `keys` is pressed.
+
+    draw() paints the whole screen (and flips); it runs once and again only
+    after the window was exposed, restored or resized. background(), if
+    given, is called between events for as long as it returns something
+    truthy (e.g. ShapeCache.warm with a small budget); after that the
+    thread sleeps in pygame.event.wait(). Returns the key, or None when the
+    window is closed.
+    """
+    draw()
+    busy = background is not None
+    while True:
+        if busy:
+            busy = background()
+            event = pygame.event.poll()
+            if event.type == pygame.NOEVENT:
+                continue
+        else:
+            event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            return None
+        if event.type == pygame.KEYDOWN and event.key in keys:
+            return event.key
+        if event.type in REPAINT_EVENTS:
+            draw()
+
+
+class FramePacer:
+    """Frame rate for each task frame: the task rate, or a low rate while unfocused."""
+
+    def __init__(self, frame_rate, idle_rate=20):
+        self.frame_rate = frame_rate
+        self.idle_rate = idle_rate      # 0 = never idle
+        self.idle = False
+        self.idle_frames = 0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.FRAME_RATE, config.IDLE_FRAME_RATE)
+
+    def handle(self, event):
+        """Track window focus from the task loop's events."""
+        if event.type == pygame.WINDOWFOCUSLOST:
+            self.idle = bool(self.idle_rate)
+        elif event.type == pygame.WINDOWFOCUSGAINED:
+            self.idle = False
+
+    def next_rate(self):
+        """The rate for the next clock.tick()."""
+        if self.idle:
+            self.idle_frames += 1
+            return self.idle_rate
+        return self.frame_rate
@@ -0,0 +1,479 @@
+"""
+Direct serial input from the controller's Arduino firmware.
+
+The HID joystick path goes through the OS driver and pygame/SDL before the
+task sees a value. SerialAxisSource reads the firmware's own serial stream
+on a dedicated thread instead and exposes the same start/stop/drain/discard
+interface as input_sampler.AxisSampler, so the task loop integrates its
+samples the same way (INPUT_MODE = "serial", SERIAL_PORT = "COM5").
+
+Frame format (little endian, FRAME_SIZE bytes):
+
+    A5 5A | seq u8 | device time u32 (micros()) | 6 x ADC u16 | checksum u8
+
+The checksum is the low byte of the sum of every byte after the sync word.
+On the Arduino side, per sample:
+
+    uint8_t f[20] = {0xA5, 0x5A, seq++};
+    uint32_t t = micros(); memcpy(f + 3, &t, 4);
+    for (int i = 0; i < 6; i++) { uint16_t v = analogRead(PINS[i]); memcpy(f + 7 + 2 * i, &v, 2); }
+    uint8_t sum = 0; for (int i = 2; i < 19; i++) sum += f[i]; f[19] = sum;
+    Serial.write(f, 20);
+
+At 1000 frames/s that needs at least 250000 baud (SERIAL_BAUD). ADC
+values are scaled to -1..1; calibration.py takes care of each
+potentiometer's real range. Frames are parsed in place from a fixed
+buffer (memoryview + struct.unpack_from), and frames that arrive in one
+read are timestamped from their device times, so a burst keeps its
+original spacing.
+
+    python serial_input.py --fake                 # self-test against a pty device (POSIX)
+    python serial_input.py COM5 --compare-hid     # how much later the HID path sees changes
+
+Uses pyserial when it is installed; otherwise a tty is opened directly
+with termios (POSIX only).
+"""
+import argparse
+import os
+import struct
+import threading
+import time
+
+from input_sampler import AxisRingBuffer
+
+SYNC = b"\xa5\x5a"
+NUM_CHANNELS = 6
+ADC_MAX = 1023
+FRAME = struct.Struct("<2sBI6HB")
+FRAME_SIZE = FRAME.size          # 20 bytes
+DEFAULT_BAUD = 250000
+
+
+def frame_checksum(frame):
+    """Checksum of a frame (bytes or memoryview) without its last byte."""
+    return sum(frame[2:FRAME_SIZE - 1]) & 0xFF
+
+
+def encode_frame(seq, device_micros, adc_values):
+    """A frame as the firmware sends it (used by the fake device)."""
+    frame = bytearray(FRAME.pack(SYNC, seq & 0xFF, device_micros & 0xFFFFFFFF,
+                                 *adc_values, 0))
+    frame[-1] = frame_checksum(frame)
+    return bytes(frame)
+
+
+class FrameParser:
+    """
+    Incremental parser over a fixed receive buffer.
+
+    The reader reads straight into free_space(); feed(n) parses the frames
+    that completed and moves the incomplete tail to the front.
+    """
+
+    def __init__(self, capacity=4096):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.frames = 0
+        self.checksum_errors = 0
+        self.skipped_bytes = 0   # bytes discarded while looking for a sync word
+        self.lost = 0            # frames missing from the sequence numbers
+        self._seq = None
+
+    def free_space(self):
+        if self.length == len(self.buffer):
+            # A full buffer without a frame: keep one byte (half a sync word)
+            self.skipped_bytes += self.length - 1
+            self.buffer[0] = self.buffer[-1]
+            self.length = 1
+        return self.view[self.length:]
+
+    def feed(self, count):
+        """
+        Parse after `count` new bytes were written into free_space().
+        Returns [(device_micros, adc_values), ...] of the complete frames.
+        """
+        end = self.length + count
+        buffer, view = self.buffer, self.view
+        frames = []
+        pos = 0
+        while end - pos >= FRAME_SIZE:
+            if buffer[pos] != 0xA5 or buffer[pos + 1] != 0x5A:
+                found = buffer.find(SYNC, pos + 1, end)
+                new_pos = found if found >= 0 else end - 1
+                self.skipped_bytes += new_pos - pos
+                pos = new_pos
+                continue
+            frame = view[pos:pos + FRAME_SIZE]
+            _, seq, device_micros, *adc, checksum = FRAME.unpack_from(buffer, pos)
+            if frame_checksum(frame) != checksum:
+                self.checksum_errors += 1
+                self.skipped_bytes += 1
+                pos += 1
+                continue
+            if self._seq is not None:
+                self.lost += (seq - self._seq - 1) & 0xFF
+            self._seq = seq
+            frames.append((device_micros, adc))
+            self.frames += 1
+            pos += FRAME_SIZE
+        # Keep the incomplete tail for the next read
+        remaining = end - pos
+        if pos:
+            buffer[:remaining] = view[pos:end]
+        self.length = remaining
+        return frames
+
+
+class _TermiosPort:
+    """Raw tty opened with os/termios (POSIX fallback without pyserial)."""
+
+    def __init__(self, path, baudrate, timeout=0.05):
+        import select
+        import termios
+        import tty
+
+        self._select = select.select
+        self.timeout = timeout
+        self.fd = os.open(path, os.O_RDWR | os.O_NOCTTY)
+        tty.setraw(self.fd)
+        speed = getattr(termios, f"B{baudrate}", None)
+        if speed is not None:
+            attrs = termios.tcgetattr(self.fd)
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(self.fd, termios.TCSANOW, attrs)
+
+    def readinto(self, view):
+        ready, _, _ = self._select([self.fd], [], [], self.timeout)
+        if not ready:
+            return 0
+        return os.readv(self.fd, [view])
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _PySerialPort:
+    def __init__(self, path, baudrate, timeout=0.05):
+        import serial
+        self.serial = serial.Serial(path, baudrate, timeout=timeout)
+
+    def readinto(self, view):
+        # Whatever is waiting (at least one byte, waiting up to the timeout)
+        count = min(len(view), max(1, self.serial.in_waiting))
+        return self.serial.readinto(view[:count])
+
+    def close(self):
+        self.serial.close()
+
+
+def open_port(path, baudrate=DEFAULT_BAUD):
+    try:
+        return _PySerialPort(path, baudrate)
+    except ImportError:
+        if os.name != "posix":
+            raise RuntimeError("Serial input needs pyserial (pip install pyserial)")
+        return _TermiosPort(path, baudrate)
+
+
+class SerialAxisSource:
+    """
+    Axis samples from the controller's serial stream, read on a thread.
+
+    Same interface as input_sampler.AxisSampler (start/stop/drain/discard),
+    plus get_name()/get_numaxes()/get_axis() so calibration.py can treat it
+    like a joystick.
+    """
+
+    def __init__(self, path, baudrate=DEFAULT_BAUD, capacity=8192):
+        self.path = path
+        self.baudrate = baudrate
+        self.num_axes = NUM_CHANNELS
+        self.buffer = AxisRingBuffer(NUM_CHANNELS, capacity)
+        self.parser = FrameParser()
+        self.values = [0.0] * NUM_CHANNELS
+        self.dropped = 0
+        self.error = None     # exception that stopped the thread, if any
+        self.listener = None  # as in AxisSampler: listener(timestamp, values) per frame
+        self._cursor = 0
+        self._port = None
+        self._running = False
+        self._thread = None
+
+    def get_name(self):
+        return f"Serial controller ({self.path})"
+
+    def get_numaxes(self):
+        return NUM_CHANNELS
+
+    def get_axis(self, index):
+        return self.values[index]
+
+    def start(self):
+        if self._port is None:
+            self._port = open_port(self.path, self.baudrate)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="SerialAxisSource",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._port is not None:
+            self._port.close()
+            self._port = None
+
+    def drain(self):
+        """All (timestamp, values) samples received since the last drain()."""
+        self._cursor, samples, dropped = self.buffer.read(self._cursor)
+        self.dropped += dropped
+        return samples
+
+    def discard(self):
+        """Skip everything received so far (e.g. after a pause screen)."""
+        self._cursor = self.buffer.written
+
+    def _run(self):
+        port, parser, push = self._port, self.parser, self.buffer.push
+        listener = self.listener
+        values = self.values
+        scale = 2.0 / ADC_MAX
+        try:
+            while self._running:
+                count = port.readinto(parser.free_space())
+                if not count:
+                    continue
+                arrival = time.perf_counter()
+                frames = parser.feed(count)
+                if not frames:
+                    continue
+                # The last frame arrived now; earlier ones of the same read
+                # are placed by their device time (micros() wraps at 2**32)
+                last_micros = frames[-1][0]
+                for device_micros, adc in frames:
+                    for i in range(NUM_CHANNELS):
+                        values[i] = adc[i] * scale - 1.0
+                    age = ((last_micros - device_micros) & 0xFFFFFFFF) * 1e-6
+                    push(arrival - age, values)
+                    if listener is not None:
+                        listener(arrival - age, values)
+        except Exception as exc:
+            self.error = exc
+            self._running = False
+
+
+# ------------------------------------------------------------------------------
+# Fake device (pty) and HID comparison
+# ------------------------------------------------------------------------------
+class FakeDevice:
+    """
+    Writes firmware frames to a pseudo-terminal, for testing without the
+    controller. `path` is the tty to open; `garbage_every` inserts junk
+    bytes every that many frames to exercise resynchronization.
+    """
+
+    def __init__(self, rate_hz=1000, garbage_every=0):
+        import tty
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self._slave = slave
+        self.path = os.ttyname(slave)
+        self.period = 1.0 / rate_hz
+        self.garbage_every = garbage_every
+        self.sent = 0
+        self.garbage = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FakeDevice", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+        os.close(self.master)
+        os.close(self._slave)
+
+    def _run(self):
+        import math
+        next_time = time.perf_counter()
+        while self._running:
+            now = time.perf_counter()
+            # The device clock is perf_counter, so arrival - device time
+            # is the transport latency
+            adc = [int((math.sin(now * (1 + i)) + 1) / 2 * ADC_MAX) for i in range(NUM_CHANNELS)]
+            frame = encode_frame(self.sent, int(now * 1e6), adc)
+            if self.garbage_every and self.sent % self.garbage_every == self.garbage_every - 1:
+                frame = b"\xa5\x00\x17" + frame
+                self.garbage += 1
+            os.write(self.master, frame)
+            self.sent += 1
+            next_time += self.period
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+def self_test(seconds, rate_hz):
+    """Stream from a FakeDevice through SerialAxisSource and report."""
+    from latency import LatencyHistogram
+
+    device = FakeDevice(rate_hz, garbage_every=250)
+    source = SerialAxisSource(device.path)
+    source.start()
+    device.start()
+    delivery = LatencyHistogram()
+    received = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        time.sleep(1 / 60)   # one task frame
+        now = time.perf_counter()
+        for sample_time, values in source.drain():
+            delivery.add(int((now - sample_time) * 1e6))
+            received += 1
+    device.stop()
+    source.stop()
+
+    parser = source.parser
+    print(f"Sent {device.sent} frames ({device.garbage} with junk in front), "
+          f"received {received}, lost {parser.lost}, "
+          f"checksum errors {parser.checksum_errors}, skipped {parser.skipped_bytes} bytes")
+    print(f"Sample to drain latency: p50 {delivery.quantile(0.5) / 1000:.2f}ms  "
+          f"p99 {delivery.quantile(0.99) / 1000:.2f}ms")
+    if source.error:
+        print(f"Reader stopped: {source.error!r}")
+    return received > 0 and source.error is None
+
+
+def estimate_lag(t_ref, ref, t_other, other, max_lag=0.2, step=0.001):
+    """
+    Delay (s) of signal `other` behind `ref`, from the peak of their
+    normalized cross-correlation on a common `step` grid, with that peak.
+    """
+    import numpy as np
+
+    start, stop = max(t_ref[0], t_other[0]), min(t_ref[-1], t_other[-1])
+    grid = np.arange(start, stop, step)
+    a = np.interp(grid, t_ref, ref)
+    b = np.interp(grid, t_other, other)
+    a -= a.mean()
+    b -= b.mean()
+    best_lag, best = 0, 0.0
+    for k in range(min(int(max_lag / step), len(grid) // 2)):
+        x, y = a[:len(a) - k], b[k:]
+        norm = np.sqrt(np.dot(x, x) * np.dot(y, y))
+        corr = np.dot(x, y) / norm if norm else 0.0
+        if abs(corr) > abs(best):
+            best_lag, best = k, corr
+    return best_lag * step, best
+
+
+def compare_with_hid(path, baudrate, seconds):
+    """
+    Record the serial stream and the HID joystick side by side while the
+    operator moves the controls, then report per channel the HID axis it
+    matches, how much later the HID path sees changes, and the number of
+    distinct levels each path delivered.
+    """
+    import numpy as np
+    import pygame
+    from input_sampler import AxisSampler
+    from startup import init_pygame
+
+    os.environ.setdefault("SDL_JOYSTICK_THREAD", "1")
+    init_pygame()
+    if pygame.joystick.get_count() == 0:
+        print("No joystick detected; the HID path can't be compared.")
+        return False
+    joystick = pygame.joystick.Joystick(0)
+    joystick.init()
+    num_hid = joystick.get_numaxes()
+
+    # Buffers big enough to hold the whole recording
+    serial_source = SerialAxisSource(path, baudrate, capacity=int(seconds * 2000) + 1024)
+    hid = AxisSampler(lambda: [joystick.get_axis(i) for i in range(num_hid)], num_hid,
+                      capacity=int(seconds * 1000) + 1024)
+    print(f"Move every control for {seconds:.0f} s...")
+    serial_source.start()
+    hid.start()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pygame.event.pump()
+        time.sleep(0.001)
+    hid.stop()
+    serial_source.stop()
+    pygame.quit()
+
+    serial_samples = serial_source.drain()
+    hid_samples = hid.drain()
+    if len(serial_samples) < 2 or len(hid_samples) < 2:
+        print(f"Not enough samples (serial {len(serial_samples)}, HID {len(hid_samples)}).")
+        return False
+    ts = np.array([t for t, _ in serial_samples])
+    sv = np.array([v for _, v in serial_samples])
+    th = np.array([t for t, _ in hid_samples])
+    hv = np.array([v for _, v in hid_samples])
+
+    hv_at_serial = np.column_stack([np.interp(ts, th, hv[:, i]) for i in range(num_hid)])
+    print(f"{'Channel':>7} {'HID axis':>8} {'Corr':>6} {'HID lag':>8} "
+          f"{'Levels serial':>13} {'Levels HID':>10}")
+    for channel in range(NUM_CHANNELS):
+        if np.ptp(sv[:, channel]) == 0:
+            continue
+        # The HID axis that follows this channel best
+        corrs = [abs(np.corrcoef(sv[:, channel], hv_at_serial[:, i])[0, 1])
+                 if np.ptp(hv_at_serial[:, i]) else 0.0 for i in range(num_hid)]
+        axis = int(np.argmax(corrs))
+        lag, corr = estimate_lag(ts, sv[:, channel], th, hv[:, axis])
+        print(f"{channel:>7} {axis:>8} {corr:>6.2f} {lag * 1000:>6.1f}ms "
+              f"{len(np.unique(sv[:, channel])):>13} {len(np.unique(hv[:, axis])):>10}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial controller input tools")
+    parser.add_argument("port", nargs="?", help="Serial port (e.g. COM5 or /dev/ttyACM0)")
+    parser.add_argument("--baud", type=int, default=DEFAULT_BAUD)
+    parser.add_argument("--fake", action="store_true",
+                        help="Self-test against a fake device on a pty (POSIX)")
+    parser.add_argument("--compare-hid", action="store_true",
+                        help="Measure the HID joystick path's delay against the serial stream")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--rate", type=int, default=1000, help="Fake device frames per second")
+    args = parser.parse_args()
+
+    if args.fake:
+        return 0 if self_test(args.seconds, args.rate) else 1
+    if not args.port:
+        parser.error("a port is needed unless --fake is given")
+    if args.compare_hid:
+        return 0 if compare_with_hid(args.port, args.baud, args.seconds) else 1
+
+    # Default: print the channels a few times a second
+    source = SerialAxisSource(args.port, args.baud)
+    source.start()
+    try:
+        while True:
+            time.sleep(0.25)
+            samples = source.drain()
+            if samples:
+                print(f"{len(samples):4d} frames  " +
+                      "  ".join(f"{v:+.3f}" for v in samples[-1][1]))
+            if source.error:
+                print(f"Reader stopped: {source.error!r}")
+                return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
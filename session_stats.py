@@ -0,0 +1,161 @@
+"""
+Streaming statistics of a session's completed trials.
+
+SessionStats keeps one RunningStat per metric (score, response time, path
+efficiency, circle and square lock time):
+
+- count, mean and variance updated with Welford's algorithm, min and max;
+- the last `window` values in a fixed ring (the pause-screen "last 10");
+- approximate quantiles from a fixed-size latency.LatencyHistogram, with
+  values quantized to the metric's unit (exact below 64 units, about 3%
+  relative error above).
+
+Memory is constant however long the session runs, adding a trial is O(1)
+and a summary costs the same after ten trials as after ten thousand. The
+pause screen shows pause_lines(); the session summary is printed by
+report() and written as JSON by dump().
+"""
+import math
+from array import array
+
+from latency import LatencyHistogram
+from output_files import write_json
+
+# (name, histogram unit); all metrics are non-negative
+METRICS = (
+    ("score", 0.01),
+    ("response_time", 1e-4),      # seconds (the scored, interpolated lock time)
+    ("path_efficiency", 1e-3),    # travelled / needed distance, both shapes (as analytics.py)
+    ("circle_lock_time", 1e-4),   # seconds from the trial start
+    ("square_lock_time", 1e-4),
+)
+
+
+class RunningStat:
+    """Welford mean/variance, a rolling window and quantiles of one metric."""
+
+    def __init__(self, unit, window=10):
+        self.unit = unit
+        self.window = window
+        self.count = 0
+        self.mean = 0.0
+        self.min = None
+        self.max = None
+        self._m2 = 0.0
+        self._recent = array("d", bytes(8 * window))
+        self.histogram = LatencyHistogram()
+
+    def add(self, value):
+        if value is None or not math.isfinite(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self._recent[(self.count - 1) % self.window] = value
+        self.histogram.add(round(value / self.unit))
+
+    @property
+    def variance(self):
+        """Sample variance (0 for fewer than two values)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def recent_mean(self):
+        """Mean of the last `window` values."""
+        n = min(self.count, self.window)
+        if not n:
+            return None
+        return math.fsum(self._recent[i] for i in range(n)) / n
+
+    def quantile(self, q):
+        value = self.histogram.quantile(q)
+        return None if value is None else value * self.unit
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std,
+            "min": self.min,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "max": self.max,
+            "recent_mean": self.recent_mean(),
+        }
+
+
+class SessionStats:
+    """RunningStats of every METRICS entry, fed one completed trial at a time."""
+
+    def __init__(self, window=10):
+        self.window = window
+        self.metrics = {name: RunningStat(unit, window) for name, unit in METRICS}
+        self.trials = 0
+
+    def add_trial(self, trial, response_time, score):
+        """Account for a completed trial_engine.TrialState."""
+        self.trials += 1
+        metrics = self.metrics
+        metrics["score"].add(score)
+        metrics["response_time"].add(response_time)
+        needed = trial.circle_needed_distance + trial.square_needed_distance
+        if needed > 0:
+            metrics["path_efficiency"].add(
+                (trial.circle_travel_distance + trial.square_travel_distance) / needed)
+        metrics["circle_lock_time"].add(trial.circle_lock_time)
+        metrics["square_lock_time"].add(trial.square_lock_time)
+
+    def pause_lines(self):
+        """Lines for the pause screen."""
+        score = self.metrics["score"]
+        response = self.metrics["response_time"]
+        efficiency = self.metrics["path_efficiency"]
+        circle = self.metrics["circle_lock_time"]
+        square = self.metrics["square_lock_time"]
+        n = min(self.trials, self.window)
+        lines = [
+            f"Average Score (last {n}): {score.recent_mean():.2f}",
+            f"Session Score: mean {score.mean:.2f} (sd {score.std:.2f}), "
+            f"median {score.quantile(0.5):.2f}",
+            f"Response Time (last {n}): {response.recent_mean():.2f}s, "
+            f"session median {response.quantile(0.5):.2f}s, p90 {response.quantile(0.9):.2f}s",
+        ]
+        if efficiency.count:
+            lines.append(f"Path Efficiency (last {n}): {efficiency.recent_mean():.2f}, "
+                         f"session {efficiency.mean:.2f}")
+        if circle.count and square.count:
+            lines.append(f"Median Lock Time: circle {circle.quantile(0.5):.2f}s, "
+                         f"square {square.quantile(0.5):.2f}s")
+        return lines
+
+    def summary(self):
+        return {name: stat.summary() for name, stat in self.metrics.items()}
+
+    def dump(self, path, metadata=None):
+        """Write the summaries as JSON."""
+        write_json(path, {
+            "metadata": metadata or {},
+            "trials": self.trials,
+            "window": self.window,
+            "metrics": self.summary(),
+        })
+
+    def report(self):
+        """Print each metric's summary."""
+        print(f"  {'':<18} {'mean':>9} {'sd':>9} {'min':>9} {'p50':>9} {'p90':>9} "
+              f"{'max':>9} {'last ' + str(self.window):>9}")
+        for name, stat in self.metrics.items():
+            if stat.count:
+                print(f"  {name:<18} {stat.mean:>9.3f} {stat.std:>9.3f} {stat.min:>9.3f} "
+                      f"{stat.quantile(0.5):>9.3f} {stat.quantile(0.9):>9.3f} "
+                      f"{stat.max:>9.3f} {stat.recent_mean():>9.3f}")
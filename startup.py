@@ -0,0 +1,93 @@
+"""
+Fast startup for the task scripts.
+
+pygame.init() brings up every subsystem, audio included, which is slow on
+the lab machines and can stall on a missing audio device. The scripts only
+need the display, the joystick and fonts, so init_pygame() initializes
+those alone; fonts themselves are loaded lazily by TextCache. StartupTimer
+reports where the startup time went.
+"""
+import time
+
+import pygame
+
+# Window size used when running windowed without an explicit size
+DEFAULT_WINDOW_SIZE = (1280, 720)
+
+
+class StartupTimer:
+    """Named startup phases, printed once the first screen is up."""
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self._last = self.start
+        self.phases = []
+        self.reported = False
+
+    def mark(self, name):
+        """End the phase `name` (it started at the previous mark)."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def report(self):
+        if self.reported:
+            return
+        self.reported = True
+        total = self._last - self.start
+        phases = ", ".join(f"{name} {duration * 1000:.0f}ms" for name, duration in self.phases)
+        print(f"Startup took {total * 1000:.0f}ms ({phases})")
+
+
+def init_pygame(timer=None):
+    """Initialize only the display, joystick and font subsystems."""
+    pygame.display.init()
+    if timer:
+        timer.mark("display")
+    pygame.joystick.init()
+    if timer:
+        timer.mark("joystick")
+    pygame.font.init()
+    if timer:
+        timer.mark("font init")
+
+
+def open_screen(fullscreen, size=(0, 0)):
+    """
+    Create the screen surface. A (0, 0) size means the display's own
+    resolution in fullscreen and DEFAULT_WINDOW_SIZE in a window.
+    """
+    if fullscreen:
+        return pygame.display.set_mode(size, pygame.FULLSCREEN)
+    if not all(size):
+        size = DEFAULT_WINDOW_SIZE
+    return pygame.display.set_mode(size)
+
+
+def open_scaled_screen(fullscreen, size, logical_size, render_scale):
+    """
+    Screen for a task that runs in a fixed logical coordinate space.
+
+    Drawing happens at logical_size x render_scale and SDL scales that to
+    the display on the GPU (pygame.SCALED, letterboxed if the aspect ratio
+    differs), so fill/draw/flip cost no longer depends on the panel. A
+    (0, 0) logical size means the display's (or window's) own size; with
+    that and render_scale 1 this is plain open_screen().
+
+    Returns (screen, (logical_width, logical_height), scale) where scale
+    converts logical units to screen pixels.
+    """
+    if not any(logical_size) and render_scale == 1:
+        screen = open_screen(fullscreen, size)
+        return screen, screen.get_size(), 1.0
+    if not all(logical_size):
+        if fullscreen:
+            logical_size = pygame.display.get_desktop_sizes()[0]
+        else:
+            logical_size = size if all(size) else DEFAULT_WINDOW_SIZE
+    logical_width, logical_height = logical_size
+    render_size = (max(1, round(logical_width * render_scale)),
+                   max(1, round(logical_height * render_scale)))
+    flags = pygame.SCALED | (pygame.FULLSCREEN if fullscreen else 0)
+    screen = pygame.display.set_mode(render_size, flags)
+    return screen, (logical_width, logical_height), render_size[0] / logical_width
@@ -0,0 +1,93 @@
+"""
+Drawing of the circle/square task, shared by the live task and replays.
+"""
+import pygame
+
+# Colors
+circle_color = (0, 255, 0)         # Green Circle
+circle_target_color = (255, 0, 0)  # Red Circle
+square_color = (0, 180, 0)         # Green Square
+square_target_color = (180, 0, 0)  # Red Square
+
+# Square outlines, updated in place each frame (DirtyRenderer copies them)
+_target_square = pygame.Rect(0, 0, 0, 0)
+_green_square = pygame.Rect(0, 0, 0, 0)
+# Where the HUD lines start
+HUD_LINE_POSITIONS = tuple((10, 10 + i * 30) for i in range(5))
+
+
+def prefetch_shapes(shapes, config, scale=1.0):
+    """Queue the green circle sprite at every radius it can take."""
+    radii = range(int(config.CIRCLE_MIN_RADIUS), int(config.CIRCLE_MAX_RADIUS) + 1)
+    shapes.prefetch(circle_color, sorted({int(r * scale) for r in radii}))
+
+
+def warm_trial(shapes, trial, scale=1.0):
+    """Make this trial's circle sprites now, at the trial switch."""
+    shapes.circle(circle_target_color, int(int(trial.red_circle_radius) * scale))
+    shapes.circle(circle_color, int(int(trial.green_circle_radius) * scale))
+
+
+def draw_task(renderer, text, trial, trial_number, positions=None):
+    """
+    Queue the shapes and HUD for one frame on a DirtyRenderer.
+
+    `positions` overrides (circle_x, circle_y, green_circle_radius,
+    square_x, square_y), e.g. with FixedStepIntegrator.render_positions().
+    """
+    if positions is None:
+        positions = (trial.circle_x, trial.circle_y, trial.green_circle_radius,
+                     trial.square_x, trial.square_y)
+    circle_x, circle_y, circle_radius, square_x, square_y = positions
+
+    # Draw red circle target ONLY if not locked
+    if not trial.circle_locked:
+        renderer.circle(
+            circle_target_color,
+            (int(trial.target_circle_x), int(trial.target_circle_y)),
+            int(trial.red_circle_radius)
+        )
+    # Always draw the green circle
+    renderer.circle(
+        circle_color,
+        (int(circle_x), int(circle_y)),
+        int(circle_radius)
+    )
+
+    # Draw red square target ONLY if not locked
+    if not trial.square_locked:
+        half_rs = trial.red_square_side / 2.0
+        _target_square.update(
+            trial.target_square_x - half_rs,
+            trial.target_square_y - half_rs,
+            trial.red_square_side,
+            trial.red_square_side
+        )
+        renderer.rect(square_target_color, _target_square)
+
+    # Always draw the green square
+    half_gs = trial.green_square_side / 2.0
+    _green_square.update(
+        square_x - half_gs,
+        square_y - half_gs,
+        trial.green_square_side,
+        trial.green_square_side
+    )
+    renderer.rect(square_color, _green_square)
+
+    # Info text (numbers are composed from cached digit glyphs)
+    info_lines = [
+        ("Trial: ", trial_number),
+        ("Circle Pos=(", int(circle_x), ", ", int(circle_y),
+         ") Radius=", int(circle_radius),
+         " [LOCKED]" if trial.circle_locked else ""),
+        ("Square Pos=(", int(square_x), ", ", int(square_y),
+         ") Side=", int(trial.green_square_side),
+         " [LOCKED]" if trial.square_locked else ""),
+        ("(Actual) CircleDist=", trial.circle_travel_distance,
+         "  (Needed) CircleDist=", trial.circle_needed_distance),
+        ("(Actual) SquareDist=", trial.square_travel_distance,
+         "  (Needed) SquareDist=", trial.square_needed_distance)
+    ]
+    for i, parts in enumerate(info_lines):
+        renderer.text_line(text, HUD_LINE_POSITIONS[i], parts)
@@ -0,0 +1,176 @@
+"""
+Per-sample telemetry recorder backed by a memory-mapped file.
+
+Every integrated input sample (positions, radius, lock flags and the raw
+controller axes) is written into fixed-size column chunks of a file that is
+memory-mapped one chunk at a time. The file grows a chunk at a time and
+only the chunk being filled is mapped, so an hour-long 1 kHz session costs
+a flat, small amount of RAM, and writing a sample only stores floats into
+the mapping (no per-sample lists, tuples or dicts).
+
+File layout: a HEADER_SIZE JSON header (columns, chunk_rows, rows and
+free-form metadata such as the session seed) followed
+by chunks of chunk_rows float64 values per column, column after column.
+load_telemetry() reads it back as NumPy arrays.
+"""
+import atexit
+import json
+import mmap
+import os
+
+from output_files import make_parent_dir
+
+# Multiple of mmap.ALLOCATIONGRANULARITY on every platform we run on
+HEADER_SIZE = 65536
+FORMAT_NAME = "6axis-telemetry"
+
+# Columns written by TrialTelemetry before the raw controller axes
+TRIAL_COLUMNS = ("time", "trial", "trial_start", "circle_x", "circle_y", "green_circle_radius",
+                 "square_x", "square_y", "circle_locked", "square_locked")
+
+
+class TelemetryRecorder:
+    """Appends rows of float64 columns to a chunked, memory-mapped file."""
+
+    def __init__(self, path, columns, chunk_rows=65536, metadata=None):
+        if (chunk_rows * 8) % mmap.ALLOCATIONGRANULARITY:
+            raise ValueError("chunk_rows * 8 must be a multiple of "
+                             f"{mmap.ALLOCATIONGRANULARITY}")
+        self.path = path
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.chunk_bytes = chunk_rows * 8 * len(self.columns)
+        self.metadata = metadata or {}
+        self.rows = 0
+
+        make_parent_dir(path)
+        self._file = open(path, "w+b")
+        self._chunks = 0
+        self._map = None
+        self._view = None
+        self._row = 0          # next row within the mapped chunk
+        self._write_header()
+        self._map_next_chunk()
+        # Leave a complete header behind even on sys.exit()
+        atexit.register(self.close)
+
+    def append(self, values):
+        """Write one row given as a sequence in column order."""
+        view = self._view
+        base = self._row
+        stride = self.chunk_rows
+        for i, value in enumerate(values):
+            view[i * stride + base] = value
+        self._advance()
+
+    def close(self):
+        if self._file is None:
+            return
+        self._unmap()
+        # Drop the unused tail of the last chunk
+        used_chunks = -(-self.rows // self.chunk_rows)
+        self._file.truncate(HEADER_SIZE + used_chunks * self.chunk_bytes)
+        self._write_header()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        atexit.unregister(self.close)
+
+    def _advance(self):
+        self._row += 1
+        self.rows += 1
+        if self._row == self.chunk_rows:
+            self._map_next_chunk()
+
+    def _map_next_chunk(self):
+        self._unmap()
+        offset = HEADER_SIZE + self._chunks * self.chunk_bytes
+        self._file.truncate(offset + self.chunk_bytes)
+        self._map = mmap.mmap(self._file.fileno(), self.chunk_bytes, offset=offset)
+        self._view = memoryview(self._map).cast("d")
+        self._chunks += 1
+        self._row = 0
+        self._write_header()
+
+    def _unmap(self):
+        if self._map is not None:
+            self._view.release()
+            self._map.flush()
+            self._map.close()
+            self._map = self._view = None
+
+    def _write_header(self):
+        header = json.dumps({
+            "format": FORMAT_NAME,
+            "columns": self.columns,
+            "chunk_rows": self.chunk_rows,
+            "rows": self.rows,
+            "metadata": self.metadata,
+        }).encode()
+        self._file.seek(0)
+        self._file.write(header.ljust(HEADER_SIZE, b" "))
+        self._file.flush()
+
+
+class TrialTelemetry(TelemetryRecorder):
+    """TRIAL_COLUMNS plus one column per raw controller axis."""
+
+    def __init__(self, path, num_axes, chunk_rows=65536, metadata=None):
+        columns = TRIAL_COLUMNS + tuple(f"axis{i}" for i in range(num_axes))
+        super().__init__(path, columns, chunk_rows, metadata)
+        self.num_axes = num_axes
+
+    def record(self, timestamp, trial_number, trial_start, state, raw_values):
+        """Write one sample of a trial_engine.TrialState and the raw axes."""
+        view = self._view
+        row = self._row
+        stride = self.chunk_rows
+        view[row] = timestamp
+        view[stride + row] = trial_number
+        view[2 * stride + row] = trial_start
+        view[3 * stride + row] = state.circle_x
+        view[4 * stride + row] = state.circle_y
+        view[5 * stride + row] = state.green_circle_radius
+        view[6 * stride + row] = state.square_x
+        view[7 * stride + row] = state.square_y
+        view[8 * stride + row] = state.circle_locked
+        view[9 * stride + row] = state.square_locked
+        base = 10 * stride + row
+        for i in range(self.num_axes):
+            view[base + i * stride] = raw_values[i]
+        self._advance()
+
+
+def read_telemetry_header(path):
+    """The JSON header of a telemetry file (columns, rows, metadata)."""
+    with open(path, "rb") as f:
+        header = json.loads(f.read(HEADER_SIZE))
+    if header.get("format") != FORMAT_NAME:
+        raise ValueError(f"{path} is not a telemetry file")
+    return header
+
+
+def load_telemetry(path):
+    """
+    Read a telemetry file into a dict of column name -> NumPy array.
+
+    Rows written after the last header update (e.g. before a crash) are
+    recovered from the last chunk by looking for non-zero timestamps.
+    """
+    import numpy as np
+
+    header = read_telemetry_header(path)
+    columns = header["columns"]
+    chunk_rows = header["chunk_rows"]
+    chunk_bytes = chunk_rows * 8 * len(columns)
+    chunks = (os.path.getsize(path) - HEADER_SIZE) // chunk_bytes
+    if chunks <= 0:
+        return {name: np.zeros(0) for name in columns}
+    # Mapped, not read: only the columns asked for are pulled off disk
+    data = np.memmap(path, dtype=np.float64, mode="r", offset=HEADER_SIZE,
+                     shape=(chunks, len(columns), chunk_rows))
+
+    recovered = (chunks - 1) * chunk_rows + int(np.count_nonzero(data[-1, 0]))
+    rows = max(header["rows"], recovered)
+
+    return {name: data[:, i, :].reshape(-1)[:rows] for i, name in enumerate(columns)}
@@ -114,24 +114,42 @@
 
 # if __name__ == "__main__":
 #     main()
+import os
 import pygame
 import sys
 import random
 import math
 import time
 
-def main():
-    pygame.init()
-
-    # -- FULLSCREEN SETUP --
-    display_info = pygame.display.Info()
-    width, height = display_info.current_w, display_info.current_h
-    screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+from text_cache import TextCache
+from input_sampler import AxisSampler
+from event_input import filter_events
+from screen_pacing import wait_for_key
+from record_sink import RecordSink
+from trial_engine import TrialConfig, entry_fraction
+from calibration import load_axis_filter
+from startup import StartupTimer, init_pygame, open_screen
+
+def main(config=None, timer=None):
+    """Run the task; launcher.py passes a config and its startup timer."""
+    startup = timer or StartupTimer()
+    # Only the display, calibration and filter settings of
+    # trial_engine.TrialConfig apply here (launcher.REACH_SETTINGS)
+    if config is None:
+        config = TrialConfig()
+    # Let SDL read the controller on its own thread (see input_sampler.py)
+    os.environ.setdefault("SDL_JOYSTICK_THREAD", "1")
+    # Display, joystick and fonts only: pygame.init() would also open audio
+    init_pygame(startup)
+
+    # -- SCREEN SETUP (native fullscreen by default) --
+    screen = open_screen(config.FULLSCREEN, (config.SCREEN_WIDTH, config.SCREEN_HEIGHT))
+    width, height = screen.get_size()
     pygame.display.set_caption("Joystick Experiment with Data Logging")
+    startup.mark("screen")
 
-    # -- FONTS --
-    pygame.font.init()
-    font = pygame.font.SysFont(None, 36)
+    # -- FONTS -- (loaded on first use)
+    text = TextCache(lambda: pygame.font.SysFont(None, 36))
 
     # -- JOYSTICK SETUP --
     joystick_count = pygame.joystick.get_count()
@@ -143,10 +161,20 @@ def main():
     joystick.init()
     print(f"Initialized joystick: {joystick.get_name()}")
     print(f"Number of axes: {joystick.get_numaxes()}")
+    startup.mark("controller")
+
+    # Both axes are sampled at 1000 Hz and every sample is integrated
+    sampler = AxisSampler(lambda: (joystick.get_axis(0), joystick.get_axis(1)),
+                          2, rate_hz=1000)
+    # Same calibration file and filter settings as the locking task
+    axis_filter, _ = load_axis_filter((0, 1), config, joystick)
+    filter_events(axis_events=False)   # axes come from the sampler, not the queue
+    sampler.start()
 
     # -- VARIABLES FOR ADJUSTING SENSITIVITY & SPEED --
     sensitivity = 1.0    # Increase to make small axis movements more significant
     base_speed = 5.0     # Base speed (pixels per update)
+    frame_rate = 60      # Updates per second the speed above refers to
 
     # -- GREEN CIRCLE (PLAYER) PROPERTIES --
     circle_color = (0, 255, 0)   # Green
@@ -168,27 +196,22 @@ def main():
         y = random.randint(radius, height - radius)
         return x, y
 
-    # Start screen: wait for ENTER
+    # Start screen: wait for ENTER (drawn once, then blocks; screen_pacing.py)
     def start_screen():
-        waiting = True
-        while waiting:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        pygame.quit()
-                        sys.exit()
-                    elif event.key == pygame.K_RETURN:
-                        waiting = False
-
+        def draw():
             # Draw start screen text
             screen.fill((0, 0, 0))
-            title_text = font.render("Press ENTER to Start", True, (255, 255, 255))
+            title_text = text.render("Press ENTER to Start")
             rect = title_text.get_rect(center=(width // 2, height // 2))
             screen.blit(title_text, rect)
             pygame.display.flip()
+            if not startup.reported:
+                startup.mark("first frame")
+                startup.report()
+
+        if wait_for_key(draw, (pygame.K_RETURN, pygame.K_ESCAPE)) != pygame.K_RETURN:
+            pygame.quit()
+            sys.exit()
 
     start_screen()
 
@@ -199,8 +222,10 @@ def main():
     trial_number = 1
 
     # Timing and distance for the current target
-    trial_start_time = time.time()
+    sampler.discard()
+    trial_start_time = last_sample_time = time.perf_counter()
     travel_distance = 0.0
+    axis_x = axis_y = 0.0
 
     # Keep track of the circle's position from the previous frame for distance
     old_x, old_y = circle_x, circle_y
@@ -218,13 +243,13 @@ def main():
         pygame.draw.line(screen, (100, 100, 100), (0, center_y), (width, center_y), 2)
 
         # Label near the center
-        label_text = font.render("X=0, Y=0", True, (255, 255, 255))
+        label_text = text.render("X=0, Y=0")
         label_rect = label_text.get_rect(center=(center_x + 60, center_y - 20))
         screen.blit(label_text, label_rect)
 
-    # OPTIONAL: Open file in 'write' mode initially to create or overwrite it, and write header
-    with open("results.txt", "w") as f:
-        f.write("Trial,Time,Distance\n")
+    # Results are streamed to results.txt (overwritten each run) by a
+    # background writer, so logging never stalls a frame
+    results = RecordSink("results.txt", "Trial,Time,Distance", fmt="csv")
 
     while running:
         clock.tick(60)
@@ -237,49 +262,58 @@ def main():
                 if event.key == pygame.K_ESCAPE:
                     running = False
 
-        # Read joystick axis values
-        axis_x = joystick.get_axis(0)
-        axis_y = joystick.get_axis(1)
-
-        # Convert axis values into position updates
-        delta_x = axis_x * base_speed * sensitivity
-        delta_y = axis_y * base_speed * sensitivity
-
-        # Update circle position
-        circle_x += int(delta_x)
-        circle_y += int(delta_y)
-
-        # Keep the circle within screen bounds
-        if circle_x < circle_radius:
-            circle_x = circle_radius
-        if circle_x > width - circle_radius:
-            circle_x = width - circle_radius
-        if circle_y < circle_radius:
-            circle_y = circle_radius
-        if circle_y > height - circle_radius:
-            circle_y = height - circle_radius
-
-        # Accumulate travel distance (Euclidean) from the previous position
-        step_dist = math.hypot(circle_x - old_x, circle_y - old_y)
-        travel_distance += step_dist
-        old_x, old_y = circle_x, circle_y
-
-        # Check if the green circle is close enough to the red target
-        dist_to_target = math.hypot(circle_x - target_x, circle_y - target_y)
-        if dist_to_target <= threshold_distance:
-            # The circle "reached" the target
-            response_time = time.time() - trial_start_time
-            print(f"Target {trial_number} Reached! Time: {response_time:.2f}s, Distance: {travel_distance:.2f}px")
-
-            # -- LOG DATA TO THE TEXT FILE --
-            with open("results.txt", "a") as f:
-                f.write(f"{trial_number},{response_time:.2f},{travel_distance:.2f}\n")
-
-            # Spawn a new target and reset for the next trial
-            trial_number += 1
-            target_x, target_y = random_position(target_radius)
-            trial_start_time = time.time()
-            travel_distance = 0.0
+        # Integrate every joystick sample taken since the last frame
+        for sample_time, values in sampler.drain():
+            axis_x, axis_y = axis_filter.process(sample_time, values)
+            sample_start = last_sample_time
+            frames = max(0.0, sample_time - last_sample_time) * frame_rate
+            last_sample_time = sample_time
+
+            # Convert axis values into position updates (whole pixels per
+            # update, as before, spread over the time this sample covers)
+            delta_x = int(axis_x * base_speed * sensitivity) * frames
+            delta_y = int(axis_y * base_speed * sensitivity) * frames
+
+            # Update circle position
+            circle_x += delta_x
+            circle_y += delta_y
+
+            # Keep the circle within screen bounds
+            if circle_x < circle_radius:
+                circle_x = circle_radius
+            if circle_x > width - circle_radius:
+                circle_x = width - circle_radius
+            if circle_y < circle_radius:
+                circle_y = circle_radius
+            if circle_y > height - circle_radius:
+                circle_y = height - circle_radius
+
+            # Accumulate travel distance (Euclidean) from the previous position
+            step_x, step_y = circle_x - old_x, circle_y - old_y
+            travel_distance += math.hypot(step_x, step_y)
+            old_x, old_y = circle_x, circle_y
+
+            # Check if the green circle is close enough to the red target
+            dist_to_target = math.hypot(circle_x - target_x, circle_y - target_y)
+            if dist_to_target <= threshold_distance:
+                # The circle "reached" the target; the time is interpolated
+                # to where it crossed the threshold within this sample
+                fraction = entry_fraction(old_x - step_x, old_y - step_y, circle_x, circle_y,
+                                          target_x, target_y, threshold_distance)
+                response_time = sample_start + fraction * (sample_time - sample_start) \
+                    - trial_start_time
+                print(f"Target {trial_number} Reached! Time: {response_time:.4f}s, Distance: {travel_distance:.2f}px")
+
+                # -- LOG DATA TO THE TEXT FILE --
+                results.write((trial_number, f"{response_time:.4f}", f"{travel_distance:.2f}"))
+
+                # Spawn a new target and reset for the next trial
+                trial_number += 1
+                target_x, target_y = random_position(target_radius)
+                sampler.discard()
+                trial_start_time = last_sample_time = time.perf_counter()
+                travel_distance = 0.0
+                break   # later samples belong to the next target
 
         # Draw everything
         screen.fill((0, 0, 0))
@@ -291,19 +325,19 @@ def main():
         pygame.draw.circle(screen, target_color, (target_x, target_y), target_radius)
 
         # Draw the green circle (player)
-        pygame.draw.circle(screen, circle_color, (circle_x, circle_y), circle_radius)
+        pygame.draw.circle(screen, circle_color, (int(circle_x), int(circle_y)), circle_radius)
 
         # Optional: display some info on screen (e.g., real-time travel distance)
-        info_text = (
-            f"Trial: {trial_number}   "
-            f"Travel Distance: {travel_distance:.1f}px   "
-            f"Axes: ({axis_x:.2f}, {axis_y:.2f})"
-        )
-        text_surf = font.render(info_text, True, (255, 255, 255))
-        screen.blit(text_surf, (10, 10))
+        text.draw_line(screen, (10, 10), (
+            "Trial: ", trial_number,
+            "   Travel Distance: ", travel_distance,
+            "px   Axes: (", (axis_x, ".2f"), ", ", (axis_y, ".2f"), ")"
+        ))
 
         pygame.display.flip()
 
+    sampler.stop()
+    results.close()
     pygame.quit()
 
 
@@ -0,0 +1,126 @@
+"""
+Per-call memory of the per-frame hot paths (tracemalloc).
+
+Each path runs N times with the garbage collector off, as TrialGC runs the
+task, and two things are measured: the peak of traced memory above the
+start (everything a call allocates, even if it frees it again before
+returning) and the allocated blocks left afterwards (sys.getallocatedblocks).
+Both have to stay flat as N grows: anything a call keeps would add up over
+the calls, and the peak has to stay under a small per-path bound.
+
+The bounds aren't zero. step() and advance() replace a few float
+attributes, and a frame gets a Rect back from every pygame blit() and
+fill() and formats the HUD numbers into short strings; all of that is
+freed within the call. Run with `python -m pytest tests` or
+`python -m unittest discover tests`.
+"""
+import gc
+import os
+import sys
+import tracemalloc
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+from dirty_render import DirtyRenderer
+from task_view import draw_task
+from text_cache import TextCache
+from trial_engine import FixedStepIntegrator, TrialConfig, TrialState, step
+
+WIDTH, HEIGHT = 640, 480
+# A trial layout (trial_layout.randomize_new_trial order) far from both locks
+LAYOUT = (40.0, 500.0, 300.0, 20.0, 100.0, 100.0,
+          60.0, 100.0, 400.0, 30.0, 500.0, 80.0)
+# Axes that keep both shapes moving (and clamped at the edges)
+AXES = [0.3, -0.2, 0.1, -0.4, 0.25]
+SHORT, LONG = 10, 2000
+# How much more a LONG run may peak at, or leave allocated, than a SHORT one
+FLAT_BYTES = 512
+FLAT_BLOCKS = 16
+
+
+def allocations(fn, calls, warmup=100):
+    """(peak traced bytes above the start, blocks left allocated) over `calls` calls."""
+    for _ in range(warmup):
+        fn()
+    gc.disable()
+    try:
+        blocks = sys.getallocatedblocks()
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in range(calls):
+                fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        gc.enable()
+    return peak - start, blocks
+
+
+class PerCallAllocationTest(unittest.TestCase):
+
+    def assertFlat(self, fn, peak_bound):
+        short_peak, short_blocks = allocations(fn, SHORT)
+        long_peak, long_blocks = allocations(fn, LONG)
+        self.assertLess(short_peak, peak_bound)
+        self.assertLess(long_peak - short_peak, FLAT_BYTES)
+        # One object kept per call would leave LONG - SHORT more blocks
+        self.assertLess(long_blocks - short_blocks, FLAT_BLOCKS)
+
+    def test_step(self):
+        config = TrialConfig()
+        trial = TrialState(LAYOUT)
+
+        def fn():
+            if step(trial, AXES, config, WIDTH, HEIGHT, 0.001):
+                trial.reset(LAYOUT)
+
+        self.assertFlat(fn, 256)
+
+    def test_integrator(self):
+        config = TrialConfig()
+        trial = TrialState(LAYOUT)
+        integrator = FixedStepIntegrator(config, WIDTH, HEIGHT)
+        integrator.reset(trial)
+
+        def fn():
+            # One 60 Hz frame: about 17 physics steps
+            if integrator.advance(trial, AXES, 1 / 60):
+                trial.reset(LAYOUT)
+                integrator.reset(trial)
+            integrator.render_positions(trial)
+
+        self.assertFlat(fn, 512)
+
+    def test_renderer(self):
+        pygame.display.init()
+        pygame.font.init()
+        self.addCleanup(pygame.quit)
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        text = TextCache(pygame.font.Font(None, 24))
+        renderer = DirtyRenderer(screen)
+        trial = TrialState(LAYOUT)
+        counter = [0]
+
+        def fn():
+            # Something moves every frame, as during a trial
+            counter[0] += 1
+            trial.circle_x = 100 + counter[0] % 300
+            trial.square_y = 80 + counter[0] % 200
+            draw_task(renderer, text, trial, counter[0] % 10 + 1)
+            renderer.render()
+            renderer.update()
+
+        self.assertFlat(fn, 2048)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Cached text rendering for the HUD and message screens.
+
+font.render rasterizes the whole string every call, which is the largest
+single cost of a frame at 4K. TextCache keeps rendered surfaces in an LRU
+cache keyed by the string, and draws numbers from pre-rendered digit glyphs
+so a counter that changes every frame never hits the rasterizer.
+"""
+from collections import OrderedDict
+
+import pygame
+
+# Characters pre-rendered once and used to compose numbers
+NUMBER_GLYPHS = "0123456789.-"
+
+
+class TextCache:
+    """Renders text with one font/color, re-rasterizing only unseen strings."""
+
+    def __init__(self, font, color=(255, 255, 255), antialias=True,
+                 max_entries=256, float_format=".1f"):
+        # `font` may also be a zero-argument callable returning the font; it
+        # is then only loaded on first use (SysFont scans the system fonts,
+        # which is slow enough to matter at startup)
+        if isinstance(font, pygame.font.Font):
+            self._font, self._load_font = font, None
+        else:
+            self._font, self._load_font = None, font
+        self.color = color
+        self.antialias = antialias
+        self.max_entries = max_entries
+        self.float_format = float_format
+
+        self._surfaces = OrderedDict()
+        self._glyphs = None
+
+        # Counters, handy when checking the cache is doing its job
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def font(self):
+        if self._font is None:
+            self._font = self._load_font()
+        return self._font
+
+    @property
+    def line_height(self):
+        return self.font.get_height()
+
+    def render(self, text):
+        """Drop-in for font.render(text, antialias, color) with caching."""
+        surf = self._surfaces.get(text)
+        if surf is not None:
+            self._surfaces.move_to_end(text)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        surf = self.font.render(text, self.antialias, self.color)
+        self._surfaces[text] = surf
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)
+        return surf
+
+    def draw_line(self, surface, pos, parts, rect=None):
+        """
+        Blit a line made of `parts` left to right starting at `pos`.
+
+        Each part is a label string (cached whole), an int, a float
+        (formatted with `float_format`) or a (value, format_spec) tuple.
+        Numbers are composed from the digit glyphs. Returns the Rect
+        covered by the line (`rect`, updated in place, if given); with
+        `surface=None` nothing is drawn and only the Rect is computed.
+        """
+        x, y = pos
+        for part in parts:
+            if isinstance(part, str):
+                if part:
+                    surf = self.render(part)
+                    if surface is not None:
+                        surface.blit(surf, (x, y))
+                    x += surf.get_width()
+                continue
+
+            if isinstance(part, tuple):
+                value, spec = part
+            elif isinstance(part, float):
+                value, spec = part, self.float_format
+            else:
+                value, spec = part, "d"
+            x = self._draw_number(surface, x, y, format(value, spec))
+
+        if rect is None:
+            return pygame.Rect(pos[0], y, x - pos[0], self.line_height)
+        rect.update(pos[0], y, x - pos[0], self.line_height)
+        return rect
+
+    def measure_line(self, pos, parts, rect=None):
+        """The Rect draw_line() would cover, without drawing anything."""
+        return self.draw_line(None, pos, parts, rect)
+
+    def _draw_number(self, surface, x, y, digits):
+        glyphs = self._glyphs
+        if glyphs is None:
+            glyphs = self._glyphs = {ch: self.font.render(ch, self.antialias, self.color)
+                                     for ch in NUMBER_GLYPHS}
+        if not all(ch in glyphs for ch in digits):
+            # e.g. "nan"/"inf" or a thousands separator: render it whole
+            surf = self.render(digits)
+            if surface is not None:
+                surface.blit(surf, (x, y))
+            return x + surf.get_width()
+        for ch in digits:
+            glyph = glyphs[ch]
+            if surface is not None:
+                surface.blit(glyph, (x, y))
+            x += glyph.get_width()
+        return x
@@ -0,0 +1,546 @@
+"""
+Trial logic for the circle/square locking task.
+
+This is the body of the old `while running:` loop in 6axis lock.py with the
+pygame parts stripped out: axis inversion/deadzone, movement, clamping,
+radius growth, lock detection and scoring. Nothing in here touches the
+screen, the joystick or the clock, so the same code drives the live task,
+the NumPy batch simulator (batch_sim.py) and offline re-scoring.
+"""
+import math
+from array import array
+
+
+class TrialConfig:
+    """
+    ADJUSTABLE PARAMETERS for the task.
+
+    The class attributes are the defaults used in the lab; pass keyword
+    overrides to change any of them for a single run, e.g.
+    TrialConfig(TARGET_REACH_THRESHOLD=20.0).
+    """
+
+    FULLSCREEN = True                    # Toggle fullscreen or windowed mode
+    SCREEN_WIDTH = 0                     # Screen/window size; 0 x 0 = native fullscreen
+    SCREEN_HEIGHT = 0                    # resolution, or 1280 x 720 when windowed
+    LOGICAL_WIDTH = 0                    # Fixed task coordinate space (px) on any monitor, e.g.
+    LOGICAL_HEIGHT = 0                   # 1920 x 1080; 0 x 0 = the screen's own size
+    RENDER_SCALE = 1.0                   # Internal render resolution relative to the logical size, upscaled to the display
+    FRAME_RATE = 60                      # Display frames per second (0 = uncapped)
+    IDLE_FRAME_RATE = 20                 # Frame rate while the window is unfocused (0 = never idle)
+    SHAPE_CACHE_MB = 128                 # Memory for pre-rendered circle sprites; 0 draws circles directly
+    ANTIALIAS_SHAPES = False             # Antialiased circles (about as fast as plain ones with sprites)
+    PHYSICS_RATE = 1000                  # Fixed simulation steps per second (see FixedStepIntegrator)
+    TRIAL_GC = True                      # Garbage collection only between trials (trial_gc.py)
+    SESSION_SEED = None                  # Seed for trial layouts; None picks a fresh one
+    LAYOUT_BANK = None                   # Precomputed layout file (layout_bank.py); None generates live
+    RECORD_PATH = "C:\\Capstone Values\\values.csv"   # Trial records are streamed here
+    RECORD_FORMAT = None                 # "csv" or "jsonl"; None picks from RECORD_PATH
+    TELEMETRY_PATH = "C:\\Capstone Values\\telemetry.tlm"  # Per-sample trajectory; None to disable
+    LATENCY_PATH = "C:\\Capstone Values\\latency.json"    # Per-stage latency histograms; None to disable
+    FRAME_PROFILE_PATH = "C:\\Capstone Values\\frames.json"  # Frame-time summary; None to disable
+    SESSION_STATS_PATH = "C:\\Capstone Values\\session.json"  # Session statistics summary; None to disable
+    INPUT_MODE = "thread"                # "thread" (input_sampler.py), "events" (event_input.py) or "serial" (serial_input.py)
+    INPUT_SAMPLE_RATE = 1000             # Controller samples per second in "thread" mode
+    SERIAL_PORT = None                   # Controller's serial port in "serial" mode, e.g. "COM5"
+    SERIAL_BAUD = 250000                 # Must match the firmware
+    ARM_STREAM_ADDRESS = None            # "host:port" to stream arm commands to (arm_stream.py); None = off
+    ARM_STREAM_RATE = 500                # Arm command datagrams per second
+    ARM_AXIS_INDICES = None              # Six controller axes sent to the arm, e.g. "5,6,7,2,0,1"; None = first six
+
+    # Movement / Position Sensitivities, in pixels per second at full
+    # deflection (the original 20 and 60 px per frame at 60 FPS)
+    CIRCLE_POSITION_SENSITIVITY = 1200
+    SQUARE_POSITION_SENSITIVITY = 3600
+
+    TARGET_REACH_THRESHOLD = 30.0        # Distance (pixels) to consider the target reached
+
+    # Circle Size Ranges (for randomizing each trial)
+    RED_RADIUS_MIN = 5
+    RED_RADIUS_MAX = 200
+    GREEN_RADIUS_MIN = 5
+    GREEN_RADIUS_MAX = 200
+
+    # Clamps for green circle growth/shrink
+    CIRCLE_MIN_RADIUS = 5                # Green circle can't get smaller than this
+    CIRCLE_MAX_RADIUS = 200              # Green circle can't get larger than this
+    SIZE_SENSITIVITY = 240.0             # How fast the green circle grows/shrinks (px/s)
+
+    # ±10% size tolerance relative to the red circle’s radius
+    RELATIVE_SIZE_TOLERANCE = 0.1        # 0.1 => ±10%
+
+    # Joystick Deadzones
+    DEADZONEx_circ = 0.1
+    DEADZONEy_circ = 0.1
+    DEADZONEz_circ = 0
+
+    DEADZONEx_sq = 0
+    DEADZONEy_sq = 0
+
+    # Axis calibration and filtering (calibration.py), applied before the
+    # deadzones above
+    CALIBRATION_PATH = "C:\\Capstone Values\\calibration.json"  # Per-device axis calibration; None to disable
+    FILTER_MIN_CUTOFF = 2.0              # One Euro cutoff (Hz) of a still axis; 0 disables the filter
+    FILTER_BETA = 5.0                    # Cutoff increase (Hz) per unit/s of axis speed (less lag when moving)
+    FILTER_D_CUTOFF = 1.0                # Cutoff (Hz) of the axis speed estimate
+    NOISE_DEADBAND = 4.0                 # Deadband around the calibrated center, in noise standard deviations
+
+    # Minimum distance constraints
+    MIN_START_DISTANCE = 150             # green circle vs. red circle must be at least this far
+    MIN_RADIUS_DIFFERENCE = 30           # |RedRadius - GreenRadius| must be >= this at trial start
+    MIN_ELEMENT_DISTANCE = 150           # circle vs. square min distance
+
+    # -------------------------------
+    # JOYSTICK AXIS CONFIG (Circle)
+    # -------------------------------
+    CIRCLE_X_AXIS_INDEX = 5
+    CIRCLE_X_AXIS_INVERT = 1
+
+    CIRCLE_Y_AXIS_INDEX = 6
+    CIRCLE_Y_AXIS_INVERT = -1
+
+    CIRCLE_Z_AXIS_INDEX = 7  # used for circle size
+    CIRCLE_Z_AXIS_INVERT = 1
+
+    # -------------------------------
+    # JOYSTICK AXIS CONFIG (Square)
+    # -------------------------------
+    SQUARE_X_AXIS_INDEX = 2
+    SQUARE_X_AXIS_INVERT = -1
+
+    SQUARE_Y_AXIS_INDEX = 0
+    SQUARE_Y_AXIS_INVERT = -1
+
+    # Square size
+    RED_SQUARE_MIN = 50
+    RED_SQUARE_MAX = 200
+    # The green square uses the same side length each trial (no in-trial size change).
+
+    def __init__(self, **overrides):
+        for name, value in overrides.items():
+            if not hasattr(TrialConfig, name) or name.startswith("_"):
+                raise TypeError(f"Unknown trial parameter: {name}")
+            setattr(self, name, value)
+
+    def as_dict(self):
+        """Every parameter (defaults and overrides) by name."""
+        return {name: getattr(self, name) for name in dir(TrialConfig)
+                if not name.startswith("_") and not callable(getattr(TrialConfig, name))}
+
+    def axis_indices(self):
+        """Joystick axis indices in AXIS_ORDER."""
+        return (self.CIRCLE_X_AXIS_INDEX, self.CIRCLE_Y_AXIS_INDEX,
+                self.CIRCLE_Z_AXIS_INDEX, self.SQUARE_X_AXIS_INDEX,
+                self.SQUARE_Y_AXIS_INDEX)
+
+    def axis_inverts(self):
+        """Axis inversion factors in AXIS_ORDER."""
+        return (self.CIRCLE_X_AXIS_INVERT, self.CIRCLE_Y_AXIS_INVERT,
+                self.CIRCLE_Z_AXIS_INVERT, self.SQUARE_X_AXIS_INVERT,
+                self.SQUARE_Y_AXIS_INVERT)
+
+    def axis_deadzones(self):
+        """Axis deadzones in AXIS_ORDER."""
+        return (self.DEADZONEx_circ, self.DEADZONEy_circ, self.DEADZONEz_circ,
+                self.DEADZONEx_sq, self.DEADZONEy_sq)
+
+
+# Order of the raw axis values passed to step(): circle x/y/z, square x/y.
+AXIS_ORDER = ("circle_x", "circle_y", "circle_z", "square_x", "square_y")
+
+# CSV columns of one trial record (see trial_record()).
+RECORD_HEADER = (
+    "Trial,Time,"
+    "CircleTraveledDist,SquareTraveledDist,"
+    "CircleNeededDist,SquareNeededDist,"
+    "RedCircleRadius,GreenCircleRadius,"
+    "MinAllowedSize,MaxAllowedSize,RadiusDiff,Score,"
+    "FrameTime"
+)
+
+# Floor for response times, so a trial that locks on its very first sample
+# (only possible with unusual settings) still gets a finite score.
+MIN_RESPONSE_TIME = 0.001
+
+
+class TrialState:
+    """
+    Positions, sizes, distances and lock flags of the trial in progress.
+
+    Slotted, and the task keeps one for the whole session and reset()s it
+    at each trial switch, so the hot loop never builds a new one.
+    """
+
+    __slots__ = (
+        "red_circle_radius", "target_circle_x", "target_circle_y",
+        "green_circle_radius", "circle_x", "circle_y",
+        "red_square_side", "target_square_x", "target_square_y",
+        "green_square_side", "square_x", "square_y",
+        "circle_needed_distance", "square_needed_distance",
+        "circle_travel_distance", "square_travel_distance",
+        "circle_locked", "square_locked", "elapsed",
+        "circle_lock_time", "square_lock_time",
+    )
+
+    def __init__(self, layout):
+        self.reset(layout)
+
+    def reset(self, layout):
+        """Start a new trial from a randomize_new_trial() layout, in place."""
+        (self.red_circle_radius,
+         self.target_circle_x, self.target_circle_y,
+         self.green_circle_radius, self.circle_x, self.circle_y,
+         self.red_square_side, self.target_square_x, self.target_square_y,
+         self.green_square_side, self.square_x, self.square_y) = layout
+
+        # The "needed distance" is the direct distance from the green
+        # shapes to the red targets at the start of the trial.
+        self.circle_needed_distance = math.hypot(
+            self.circle_x - self.target_circle_x,
+            self.circle_y - self.target_circle_y)
+        self.square_needed_distance = math.hypot(
+            self.square_x - self.target_square_x,
+            self.square_y - self.target_square_y)
+
+        # Distances traveled (still tracked, but NOT used for scoring)
+        self.circle_travel_distance = 0.0
+        self.square_travel_distance = 0.0
+
+        # Lock flags: set True once each shape meets its condition
+        self.circle_locked = False
+        self.square_locked = False
+
+        # Seconds of input integrated since the trial started
+        self.elapsed = 0.0
+
+        # Interpolated moment (seconds since the start) each shape met its
+        # lock condition; see lock_time()
+        self.circle_lock_time = None
+        self.square_lock_time = None
+
+    @property
+    def done(self):
+        return self.circle_locked and self.square_locked
+
+
+def read_axes(joystick, config):
+    """Raw joystick values in AXIS_ORDER."""
+    return tuple(joystick.get_axis(i) for i in config.axis_indices())
+
+
+def select_axes(values, config):
+    """Pick the AXIS_ORDER values out of a full list of controller axes."""
+    return tuple(values[i] for i in config.axis_indices())
+
+
+def apply_axis(raw, invert, deadzone):
+    """Inversion followed by a hard deadzone."""
+    value = raw * invert
+    if abs(value) < deadzone:
+        return 0
+    return value
+
+
+def entry_fraction(x0, y0, x1, y1, target_x, target_y, threshold):
+    """
+    How far (0..1) along the straight move (x0, y0) -> (x1, y1) the point
+    first comes within `threshold` of the target. The end point must be
+    within it.
+    """
+    fx, fy = x0 - target_x, y0 - target_y
+    c = fx * fx + fy * fy - threshold * threshold
+    dx, dy = x1 - x0, y1 - y0
+    a = dx * dx + dy * dy
+    if c <= 0 or a == 0:
+        return 0.0
+    b = 2 * (fx * dx + fy * dy)
+    # Smaller root of a*s^2 + b*s + c = 0 (real, as the end point is inside)
+    s = (-b - math.sqrt(max(0.0, b * b - 4 * a * c))) / (2 * a)
+    return min(1.0, max(0.0, s))
+
+
+def band_entry_fraction(r0, r1, low, high):
+    """How far (0..1) from r0 to r1 the value enters [low, high] (r1 must be in it)."""
+    if low <= r0 <= high:
+        return 0.0
+    edge = low if r0 < low else high
+    return min(1.0, max(0.0, (edge - r0) / (r1 - r0)))
+
+
+def allowed_size_range(red_circle_radius, config):
+    """(min, max) green radius accepted as a size match."""
+    return (red_circle_radius * (1 - config.RELATIVE_SIZE_TOLERANCE),
+            red_circle_radius * (1 + config.RELATIVE_SIZE_TOLERANCE))
+
+
+def step(state, axes, config, screen_width, screen_height, dt):
+    """
+    Advance `state` by `dt` seconds using raw axis values in AXIS_ORDER.
+
+    The task drives this through FixedStepIntegrator, so `dt` is always
+    1 / PHYSICS_RATE there. Returns True once both shapes are locked (the
+    trial is complete).
+    """
+    raw_cx, raw_cy, raw_cz, raw_sx, raw_sy = axes
+    start_time = state.elapsed
+    state.elapsed += dt
+
+    # ---------------------------------------------------------
+    # Circle updates (only if not locked)
+    # ---------------------------------------------------------
+    if not state.circle_locked:
+        axis_cx = apply_axis(raw_cx, config.CIRCLE_X_AXIS_INVERT, config.DEADZONEx_circ)
+        axis_cy = apply_axis(raw_cy, config.CIRCLE_Y_AXIS_INVERT, config.DEADZONEy_circ)
+        axis_cz = apply_axis(raw_cz, config.CIRCLE_Z_AXIS_INVERT, config.DEADZONEz_circ)
+
+        old_circle_x, old_circle_y = state.circle_x, state.circle_y
+        old_radius = radius = state.green_circle_radius
+
+        # Movement
+        circle_x = old_circle_x + axis_cx * config.CIRCLE_POSITION_SENSITIVITY * dt
+        circle_y = old_circle_y + axis_cy * config.CIRCLE_POSITION_SENSITIVITY * dt
+
+        # Clamp to screen
+        if circle_x < radius:
+            circle_x = radius
+        if circle_x > screen_width - radius:
+            circle_x = screen_width - radius
+        if circle_y < radius:
+            circle_y = radius
+        if circle_y > screen_height - radius:
+            circle_y = screen_height - radius
+
+        # Adjust circle size
+        radius += axis_cz * config.SIZE_SENSITIVITY * dt
+        if radius < config.CIRCLE_MIN_RADIUS:
+            radius = config.CIRCLE_MIN_RADIUS
+        if radius > config.CIRCLE_MAX_RADIUS:
+            radius = config.CIRCLE_MAX_RADIUS
+
+        # Distance traveled (NOT used in final score)
+        state.circle_travel_distance += math.hypot(circle_x - old_circle_x,
+                                                   circle_y - old_circle_y)
+        state.circle_x, state.circle_y = circle_x, circle_y
+        state.green_circle_radius = radius
+
+        # Check if circle reached
+        dist_circ_to_target = math.hypot(circle_x - state.target_circle_x,
+                                         circle_y - state.target_circle_y)
+        # allowed_size_range(), without building a tuple every step
+        tolerance = config.RELATIVE_SIZE_TOLERANCE
+        min_allowed_size = state.red_circle_radius * (1 - tolerance)
+        max_allowed_size = state.red_circle_radius * (1 + tolerance)
+        if dist_circ_to_target <= config.TARGET_REACH_THRESHOLD and \
+           min_allowed_size <= radius <= max_allowed_size:
+            # Lock the circle in place
+            state.circle_locked = True
+            # Movement within a sample is linear: find where the circle
+            # entered both the distance threshold and the size band
+            fraction = max(
+                entry_fraction(old_circle_x, old_circle_y, circle_x, circle_y,
+                               state.target_circle_x, state.target_circle_y,
+                               config.TARGET_REACH_THRESHOLD),
+                band_entry_fraction(old_radius, radius, min_allowed_size, max_allowed_size))
+            state.circle_lock_time = start_time + fraction * dt
+
+    # ---------------------------------------------------------
+    # Square updates (only if not locked)
+    # ---------------------------------------------------------
+    if not state.square_locked:
+        axis_sx = apply_axis(raw_sx, config.SQUARE_X_AXIS_INVERT, config.DEADZONEx_sq)
+        axis_sy = apply_axis(raw_sy, config.SQUARE_Y_AXIS_INVERT, config.DEADZONEy_sq)
+
+        old_square_x, old_square_y = state.square_x, state.square_y
+
+        # Movement
+        square_x = old_square_x + axis_sx * config.SQUARE_POSITION_SENSITIVITY * dt
+        square_y = old_square_y + axis_sy * config.SQUARE_POSITION_SENSITIVITY * dt
+
+        # Clamp to screen
+        half_gs = state.green_square_side / 2.0
+        if square_x < half_gs:
+            square_x = half_gs
+        if square_x > screen_width - half_gs:
+            square_x = screen_width - half_gs
+        if square_y < half_gs:
+            square_y = half_gs
+        if square_y > screen_height - half_gs:
+            square_y = screen_height - half_gs
+
+        # Distance traveled (NOT used in final score)
+        state.square_travel_distance += math.hypot(square_x - old_square_x,
+                                                   square_y - old_square_y)
+        state.square_x, state.square_y = square_x, square_y
+
+        # Check if square reached
+        dist_sq_to_target = math.hypot(square_x - state.target_square_x,
+                                       square_y - state.target_square_y)
+        if dist_sq_to_target <= config.TARGET_REACH_THRESHOLD:
+            # Lock the square in place
+            state.square_locked = True
+            fraction = entry_fraction(old_square_x, old_square_y, square_x, square_y,
+                                      state.target_square_x, state.target_square_y,
+                                      config.TARGET_REACH_THRESHOLD)
+            state.square_lock_time = start_time + fraction * dt
+
+    return state.circle_locked and state.square_locked
+
+
+def lock_time(state):
+    """
+    Seconds from the trial start to the moment the second shape met its
+    lock condition, interpolated within the step that locked it (instead
+    of quantized to the sample or frame that noticed).
+    """
+    return max(state.circle_lock_time, state.square_lock_time, MIN_RESPONSE_TIME)
+
+
+class FixedStepIntegrator:
+    """
+    Runs step() at a fixed PHYSICS_RATE whatever the input sample rate or
+    display frame rate, so the motion of a trial doesn't depend on how fast
+    the machine renders.
+
+    Input time is collected in an accumulator and consumed in whole steps;
+    render_positions() interpolates between the last two steps for
+    drawing. Positions are kept in preallocated buffers, so stepping
+    allocates nothing that outlives the step.
+    """
+
+    def __init__(self, config, screen_width, screen_height):
+        self.config = config
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.step_dt = 1.0 / config.PHYSICS_RATE
+        self.accumulator = 0.0
+        self._previous = array("d", bytes(8 * 5))
+        self._render = [0.0] * 5
+
+    def reset(self, state):
+        """Start integrating a new trial."""
+        self.accumulator = 0.0
+        self._store_previous(state)
+
+    def advance(self, state, axes, dt):
+        """
+        Integrate `dt` seconds of constant raw `axes` (AXIS_ORDER).
+        Returns True as soon as the trial is complete; the rest of the
+        time is dropped with it.
+        """
+        self.accumulator += dt
+        step_dt = self.step_dt
+        while self.accumulator >= step_dt:
+            self.accumulator -= step_dt
+            self._store_previous(state)
+            if step(state, axes, self.config, self.screen_width, self.screen_height,
+                    step_dt):
+                self.accumulator = 0.0
+                return True
+        return False
+
+    def render_positions(self, state):
+        """
+        [circle_x, circle_y, green_circle_radius, square_x, square_y] for
+        drawing, blended between the last two steps by the time left in
+        the accumulator. The list is reused: valid until the next call.
+        """
+        alpha = self.accumulator / self.step_dt
+        previous = self._previous
+        positions = self._render
+        positions[0] = previous[0] + (state.circle_x - previous[0]) * alpha
+        positions[1] = previous[1] + (state.circle_y - previous[1]) * alpha
+        positions[2] = previous[2] + (state.green_circle_radius - previous[2]) * alpha
+        positions[3] = previous[3] + (state.square_x - previous[3]) * alpha
+        positions[4] = previous[4] + (state.square_y - previous[4]) * alpha
+        return positions
+
+    def _store_previous(self, state):
+        previous = self._previous
+        previous[0] = state.circle_x
+        previous[1] = state.circle_y
+        previous[2] = state.green_circle_radius
+        previous[3] = state.square_x
+        previous[4] = state.square_y
+
+
+def compute_score(state, response_time):
+    """
+    Score based on:
+      1) radius_diff * 3.0 / response_time
+      2) (circle_needed_distance + square_needed_distance) / response_time
+
+    Returns (radius_diff, score).
+    """
+    radius_diff = abs(state.red_circle_radius - state.green_circle_radius)
+    needed_dist_sum = state.circle_needed_distance + state.square_needed_distance
+
+    score = (radius_diff * 3.0 / response_time) + \
+            (needed_dist_sum / response_time)
+    return radius_diff, score
+
+
+def trial_record(trial_number, state, response_time, config, frame_time=None):
+    """
+    The RECORD_HEADER row for a completed trial.
+
+    `response_time` (the interpolated lock_time()) is the one scored;
+    `frame_time` is the time of the frame that noticed the lock.
+    """
+    radius_diff, score = compute_score(state, response_time)
+    min_allowed_size, max_allowed_size = allowed_size_range(
+        state.red_circle_radius, config)
+    return (
+        trial_number,
+        round(response_time, 4),
+        round(state.circle_travel_distance, 2),  # actual traveled
+        round(state.square_travel_distance, 2),  # actual traveled
+        round(state.circle_needed_distance, 2),  # needed
+        round(state.square_needed_distance, 2),  # needed
+        round(state.red_circle_radius, 2),
+        round(state.green_circle_radius, 2),
+        round(min_allowed_size, 2),
+        round(max_allowed_size, 2),
+        round(radius_diff, 2),
+        round(score, 2),
+        round(response_time if frame_time is None else frame_time, 4)
+    )
+
+
+# String settings that have no "disabled" value
+REQUIRED_SETTINGS = ("RECORD_PATH", "INPUT_MODE")
+
+
+def parse_overrides(pairs):
+    """Turn ["NAME=value", ...] strings into TrialConfig keyword overrides."""
+    overrides = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        name = name.strip()
+        if name.startswith("_") or not hasattr(TrialConfig, name) \
+                or callable(getattr(TrialConfig, name)):
+            raise ValueError(f"Unknown trial parameter: {name}")
+        default = getattr(TrialConfig, name)
+        value = value.strip()
+        if default is None:
+            # Optional settings (seed, file paths): a number or a string
+            if value.lower() == "none":
+                value = None
+            else:
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+        elif isinstance(default, str):
+            # File paths: "none" disables, as with the None defaults
+            if value.lower() == "none":
+                if name in REQUIRED_SETTINGS:
+                    raise ValueError(f"{name} cannot be None")
+                value = None
+        elif isinstance(default, bool):
+            value = value.lower() in ("1", "true", "yes", "on")
+        elif isinstance(default, (int, float)):
+            value = float(value)
+            if isinstance(default, int) and value.is_integer():
+                value = int(value)
+        overrides[name] = value
+    return overrides
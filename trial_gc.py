@@ -0,0 +1,59 @@
+"""
+Garbage collection kept out of timed trials.
+
+CPython's cyclic collector runs whenever enough container objects have
+piled up, wherever the program happens to be, and a pass over the older
+generations of a pygame/NumPy heap takes milliseconds: a frame spike if it
+lands inside a trial. The task loop allocates very little per frame, so
+TrialGC simply takes the collector's timing into its own hands:
+
+- after setup everything alive is collected and frozen (gc.freeze), so
+  later passes never walk the startup heap again;
+- automatic collection is off while the task runs;
+- the young generations are collected at each trial switch (well under a
+  millisecond) and everything on the pause screen, where time is free.
+"""
+import gc
+import time
+
+
+class TrialGC:
+    """Collects garbage between trials instead of whenever CPython decides."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.collections = 0
+        self.longest_ms = 0.0
+
+    def start(self):
+        """After setup, before the first trial."""
+        if not self.enabled:
+            return
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+
+    def stop(self):
+        if self.enabled:
+            gc.enable()
+
+    def between_trials(self):
+        """At a trial switch: the young generations only."""
+        if self.enabled:
+            self._collect(1)
+
+    def idle(self):
+        """On a static screen: a full collection."""
+        if self.enabled:
+            self._collect(2)
+
+    def _collect(self, generation):
+        started = time.perf_counter()
+        gc.collect(generation)
+        self.collections += 1
+        self.longest_ms = max(self.longest_ms, (time.perf_counter() - started) * 1000)
+
+    def report(self):
+        if self.collections:
+            print(f"  {self.collections} collections between trials, "
+                  f"longest {self.longest_ms:.2f}ms")
@@ -0,0 +1,131 @@
+import math
+import random
+
+import numpy as np
+
+
+# -----------------------------------------------------------------------------
+# sample_layouts: vectorized rejection sampling
+# -----------------------------------------------------------------------------
+# Column order of a layout (the 12-tuple TrialState takes)
+R_RED, RCX, RCY, R_GREEN, GCX, GCY, RS_SIDE, RSX, RSY, GS_SIDE, GSX, GSY = range(12)
+
+
+def _draw_candidates(config, screen_width, screen_height, size, rng):
+    """`size` independent candidate layouts as a (size, 12) int64 array."""
+    out = np.empty((size, 12), dtype=np.int64)
+    r_red = rng.integers(config.RED_RADIUS_MIN, config.RED_RADIUS_MAX, size, endpoint=True)
+    r_green = rng.integers(config.GREEN_RADIUS_MIN, config.GREEN_RADIUS_MAX, size,
+                           endpoint=True)
+    side = rng.integers(config.RED_SQUARE_MIN, config.RED_SQUARE_MAX, size, endpoint=True)
+    # Centers keep each shape fully on screen (squares: half a side from the edge)
+    half = side // 2
+    far_x = (screen_width - side / 2.0).astype(np.int64)
+    far_y = (screen_height - side / 2.0).astype(np.int64)
+
+    out[:, R_RED] = r_red
+    out[:, RCX] = rng.integers(r_red, screen_width - r_red, endpoint=True)
+    out[:, RCY] = rng.integers(r_red, screen_height - r_red, endpoint=True)
+    out[:, R_GREEN] = r_green
+    out[:, GCX] = rng.integers(r_green, screen_width - r_green, endpoint=True)
+    out[:, GCY] = rng.integers(r_green, screen_height - r_green, endpoint=True)
+    out[:, RS_SIDE] = side
+    out[:, RSX] = rng.integers(half, far_x, endpoint=True)
+    out[:, RSY] = rng.integers(half, far_y, endpoint=True)
+    # The green square uses the same side length as the red one
+    out[:, GS_SIDE] = side
+    out[:, GSX] = rng.integers(half, far_x, endpoint=True)
+    out[:, GSY] = rng.integers(half, far_y, endpoint=True)
+    return out
+
+
+def _valid_layouts(c, config):
+    """Boolean mask of the candidates meeting every start constraint."""
+    r_red = c[:, R_RED]
+    r_green = c[:, R_GREEN]
+    # Squares are treated as circles bounded by their half-diagonal
+    sq_bound = c[:, RS_SIDE] * (math.sqrt(2) / 2.0)
+    min_gap = config.MIN_ELEMENT_DISTANCE
+
+    def dist(a, b):
+        return np.hypot(c[:, a[0]] - c[:, b[0]], c[:, a[1]] - c[:, b[1]])
+
+    red_circ, green_circ = (RCX, RCY), (GCX, GCY)
+    red_sq, green_sq = (RSX, RSY), (GSX, GSY)
+    d_rc_rs = dist(red_circ, red_sq)
+    d_rc_gs = dist(red_circ, green_sq)
+    d_gc_rs = dist(green_circ, red_sq)
+    d_gc_gs = dist(green_circ, green_sq)
+
+    return ((np.abs(r_red - r_green) >= config.MIN_RADIUS_DIFFERENCE)
+            & (dist(red_circ, green_circ) >= config.MIN_START_DISTANCE)
+            # No overlaps
+            & (d_rc_rs >= r_red + sq_bound)
+            & (d_rc_gs >= r_red + sq_bound)
+            & (d_gc_gs >= r_green + sq_bound)
+            & (dist(red_sq, green_sq) >= 2 * sq_bound)
+            # Minimal circle vs. square distances
+            & (d_rc_rs >= r_red + sq_bound + min_gap)
+            & (d_rc_gs >= r_red + sq_bound + min_gap)
+            & (d_gc_rs >= r_green + sq_bound + min_gap)
+            & (d_gc_gs >= r_green + sq_bound + min_gap))
+
+
+def sample_layouts(config, screen_width, screen_height, count, rng,
+                   batch_size=1024, max_empty_batches=64):
+    """
+    `count` valid trial layouts as a (count, 12) int64 array.
+
+    Candidates are drawn and checked a batch at a time with NumPy, so the
+    cost per layout is a few array operations instead of thousands of
+    Python-level retries. `rng` is a numpy.random.Generator.
+
+    Raises ValueError when the shapes can't fit on the screen, or when
+    `max_empty_batches` batches in a row produce no valid layout (the
+    constraints are effectively infeasible at this screen size), which
+    bounds the time spent before giving up.
+    """
+    largest = max(2 * config.RED_RADIUS_MAX, 2 * config.GREEN_RADIUS_MAX, config.RED_SQUARE_MAX)
+    if largest > min(screen_width, screen_height):
+        raise ValueError(f"Shapes up to {largest}px don't fit on a "
+                         f"{screen_width}x{screen_height} screen")
+
+    found = []
+    needed = count
+    empty_batches = 0
+    while needed > 0:
+        candidates = _draw_candidates(config, screen_width, screen_height, batch_size, rng)
+        valid = candidates[_valid_layouts(candidates, config)]
+        if len(valid) == 0:
+            empty_batches += 1
+            if empty_batches >= max_empty_batches:
+                raise ValueError(
+                    f"No valid trial layout in {empty_batches * batch_size} candidates "
+                    f"on a {screen_width}x{screen_height} screen; reduce the shape "
+                    "sizes or MIN_START_DISTANCE/MIN_ELEMENT_DISTANCE")
+            continue
+        empty_batches = 0
+        found.append(valid[:needed])
+        needed -= len(found[-1])
+    return np.concatenate(found)
+
+
+# -----------------------------------------------------------------------------
+# randomize_new_trial
+# -----------------------------------------------------------------------------
+def randomize_new_trial(config, screen_width, screen_height, rng=random):
+    """
+    Picks new positions/sizes for:
+      - Red & Green circles
+      - Red & Green squares
+    Ensures no overlap and meets minimal distance constraints.
+
+    `rng` is anything with a getrandbits() method (the `random` module or
+    a seeded random.Random); it seeds the NumPy generator used by
+    sample_layouts(), so a seeded session stays reproducible. Returns the
+    12-tuple
+    (r_red, rcx, rcy, r_green, gcx, gcy, rs_side, rsx, rsy, gs_side, gsx, gsy).
+    """
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    layout = sample_layouts(config, screen_width, screen_height, 1, np_rng, batch_size=256)
+    return tuple(layout[0].tolist())